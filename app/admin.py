@@ -1,5 +1,25 @@
 from django.contrib import admin
-from .models import Payment
+from django.template.response import TemplateResponse
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .models import Payment, PaymentStatusCounter, WebhookDeadLetter
+from .recheck import recheck_payments
+
+
+class PaymentPaginator(Paginator):
+    """
+    Paginateur lisant le nombre total de paiements dans PaymentStatusCounter
+
+    Sans filtre ni recherche, le COUNT(*) de la table est remplacé par la
+    somme des compteurs par statut.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return PaymentStatusCounter.get_counts()["total"]
+        return super().count
 
 
 @admin.register(Payment)
@@ -14,8 +34,13 @@ class PaymentAdmin(admin.ModelAdmin):
     )
     list_filter = ("status", "created_at")
     search_fields = ("lastname", "firstname", "phone", "reference")
+    search_help_text = "Référence eT…, numéro de téléphone, nom ou prénom (début)"
     readonly_fields = ("reference", "created_at", "updated_at")
     list_per_page = 20
+    paginator = PaymentPaginator
+    actions = ["recheck_status"]
+    # Pas de second COUNT(*) de toute la table lors d'une recherche filtrée
+    show_full_result_count = False
 
     fieldsets = (
         ("Informations personnelles", {"fields": ("lastname", "firstname", "phone")}),
@@ -26,3 +51,40 @@ class PaymentAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return queryset.order_by("-created_at")
+
+    @admin.action(description="Revérifier le statut auprès d'Arzeka")
+    def recheck_status(self, request, queryset):
+        rows, elapsed = recheck_payments(
+            queryset.only("id", "reference", "status", "updated_at").order_by("id")
+        )
+        return TemplateResponse(
+            request,
+            "admin/app/payment/recheck_status.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.model._meta,
+                "title": "Revérification des paiements",
+                "rows": rows,
+                "elapsed": elapsed,
+                "checked": sum(1 for row in rows if not row["error"]),
+            },
+        )
+
+    def delete_queryset(self, request, queryset):
+        # Action « supprimer la sélection » : QuerySet.delete() contournerait
+        # les compteurs par statut et les agrégats
+        Payment.bulk_delete(queryset)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Recherche par index (Payment.search_filter) au lieu des LIKE '%terme%'
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(Payment.search_filter(search_term)), False
+
+
+@admin.register(WebhookDeadLetter)
+class WebhookDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ("reference", "attempts", "error", "failed_at")
+    search_fields = ("reference",)
+    readonly_fields = ("job", "reference", "payload", "attempts", "error", "failed_at")
+    list_per_page = 20
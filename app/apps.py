@@ -5,11 +5,8 @@ class AppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app"
 
-    def ready(self):
-        from django.conf import settings
-        from fasoarzeka import authenticate
-
-        FASOARZEKA_USERNAME = getattr(settings, "FASOARZEKA_USERNAME", None)
-        FASOARZEKA_PASSWORD = getattr(settings, "FASOARZEKA_PASSWORD", None)
+    # L'authentification auprès d'Arzeka est faite à la demande, au premier
+    # appel de la passerelle (voir app.gateway.ensure_authenticated)
 
-        authenticate(FASOARZEKA_USERNAME, FASOARZEKA_PASSWORD)
+    def ready(self):
+        from app import checks  # noqa: F401
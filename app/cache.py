@@ -0,0 +1,68 @@
+from django.core.cache import caches
+from django.db import transaction
+
+from app.metrics import FRAGMENT_READS, counter_values
+
+FRAGMENT_CACHE = "fragments"
+
+
+def get_fragment(name, pk, version, render):
+    """
+    Renvoie un fragment HTML rendu, depuis le cache si sa version est à jour
+
+    Une seule entrée est conservée par objet avec sa version, lue en base à
+    chaque appel et qui doit changer avec tout ce que le fragment affiche :
+    une entrée obsolète n'est jamais servie, même si le cache des fragments
+    est propre à chaque processus. Les entrées inutilisées sont évincées par
+    la taille maximale du cache.
+    """
+    cache = caches[FRAGMENT_CACHE]
+    key = f"{name}:{pk}"
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        FRAGMENT_READS.labels("hits").inc()
+        return cached[1]
+
+    FRAGMENT_READS.labels("misses").inc()
+    html = render()
+    cache.set(key, (version, html))
+    return html
+
+
+def invalidate_fragments(name, *pks):
+    """
+    Supprime les fragments des objets, après validation de la transaction
+
+    Libère seulement la mémoire du processus courant : la fraîcheur repose
+    sur la version passée à get_fragment.
+    """
+    keys = [f"{name}:{pk}" for pk in pks]
+    transaction.on_commit(lambda: caches[FRAGMENT_CACHE].delete_many(keys))
+
+
+def incr_stat(key, timeout=None):
+    """Incrémente un compteur conservé dans le cache par défaut et le renvoie"""
+    # Cache par défaut, partagé entre processus : réservé aux compteurs
+    # d'état (disjoncteur, budget) et aux vérifications de la passerelle
+    cache = caches["default"]
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=timeout)
+        return cache.incr(key)
+
+
+def get_stats(prefix, names):
+    """Lit plusieurs compteurs `<prefix>:<nom>` en une seule requête au cache"""
+    values = caches["default"].get_many([f"{prefix}:{name}" for name in names])
+    return {name: values.get(f"{prefix}:{name}", 0) for name in names}
+
+
+def fragment_stats():
+    """
+    Nombre de lectures servies par le cache (hits) ou rendues (misses)
+
+    Comptées en mémoire par chaque processus : tous workers confondus
+    seulement avec PROMETHEUS_MULTIPROC_DIR.
+    """
+    return counter_values("payment_fragment_cache", ["hits", "misses"])
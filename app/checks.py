@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core import checks
+
+# Caches propres à chaque processus : l'état du disjoncteur, du budget de
+# nouvelles tentatives et des limites de débit y serait multiplié par le
+# nombre de workers
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Le cache par défaut doit être partagé entre les processus"""
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            checks.Error(
+                f"Le cache par défaut ({backend}) n'est pas partagé entre les "
+                "processus.",
+                hint=(
+                    "Disjoncteur, budget de nouvelles tentatives et limites de "
+                    "débit y sont conservés : utiliser le cache en base "
+                    "(dbcache://arzeka_cache) ou Redis via CACHE_URL."
+                ),
+                id="app.E001",
+            )
+        ]
+    return []
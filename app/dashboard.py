@@ -0,0 +1,39 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from app.models import Payment, PaymentRollup
+
+
+def day_bounds(since, until):
+    """Bornes [début, fin) couvrant les jours `since` à `until` inclus"""
+    return (
+        timezone.make_aware(datetime.combine(since, time.min)),
+        timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min)),
+    )
+
+
+def dashboard_data(granularity, since, until):
+    """
+    Séries et totaux du tableau de bord, lus uniquement dans PaymentRollup
+
+    Returns:
+        dict: "series" (une entrée par période, voir PaymentRollup.get_series)
+        et "totals" par statut sur toute la période, ainsi que les totaux
+        généraux "count" et "amount"
+    """
+    series = PaymentRollup.get_series(granularity, *day_bounds(since, until))
+    totals = {status: {"count": 0, "amount": 0} for status, _ in Payment.STATUS_CHOICES}
+    for point in series:
+        for status, values in point["statuses"].items():
+            totals[status]["count"] += values["count"]
+            totals[status]["amount"] += values["amount"]
+    return {
+        "granularity": granularity,
+        "since": since,
+        "until": until,
+        "totals": totals,
+        "count": sum(values["count"] for values in totals.values()),
+        "amount": sum(values["amount"] for values in totals.values()),
+        "series": series,
+    }
@@ -0,0 +1,88 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from app.models import Payment
+
+EXPORT_FIELDS = [
+    "id",
+    "reference",
+    "transaction_id",
+    "lastname",
+    "firstname",
+    "phone",
+    "amount",
+    "status",
+    "created_at",
+    "updated_at",
+]
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def export_queryset(status=None, since=None, until=None):
+    """
+    Paiements à exporter, sous forme de tuples (EXPORT_FIELDS)
+
+    Les dates `since` et `until` (incluses) deviennent des bornes sur
+    created_at pour que l'index (created_at, id) soit utilisé.
+    """
+    queryset = Payment.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if since:
+        queryset = queryset.filter(
+            created_at__gte=timezone.make_aware(datetime.combine(since, time.min))
+        )
+    if until:
+        queryset = queryset.filter(
+            created_at__lt=timezone.make_aware(
+                datetime.combine(until + timedelta(days=1), time.min)
+            )
+        )
+    return queryset.order_by("created_at", "id").values_list(*EXPORT_FIELDS)
+
+
+class Echo:
+    """Pseudo-fichier renvoyant ce qu'on lui écrit, pour csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, format="csv", chunk_size=2000):
+    """
+    Génère l'export ligne par ligne
+
+    Les lignes sont lues par lots de `chunk_size` (curseur côté serveur sous
+    PostgreSQL) : la mémoire utilisée ne dépend pas du nombre de paiements.
+    """
+    rows = (
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in queryset.iterator(chunk_size=chunk_size)
+    )
+    if format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+def buffered(chunks, size=65536):
+    """Regroupe de petits morceaux de texte en blocs d'environ `size` caractères"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,41 @@
+import json
+import zlib
+
+from django.db import models
+
+
+class CompressedJSONField(models.BinaryField):
+    """
+    Champ JSON stocké compressé (zlib) dans une colonne binaire
+
+    La (dé)compression est transparente : on lit et écrit des objets Python.
+    """
+
+    def __init__(self, *args, level=6, **kwargs):
+        self.level = level
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.level != 6:
+            kwargs["level"] = self.level
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(value))
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return json.loads(zlib.decompress(value))
+        return value
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        return zlib.compress(raw.encode(), self.level)
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj), ensure_ascii=False)
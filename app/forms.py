@@ -1,12 +1,9 @@
-from django import forms
-from django.core.validators import RegexValidator
-
-from app.models import Payment
-
-from fasoarzeka import initiate_payment, check_payment, authenticate
-from fasoarzeka.exceptions import ArzekaAPIError
+from datetime import timedelta
 
+from django import forms
+from django.utils import timezone
 
+from app.models import Payment, PaymentRollup
 
 
 class PaymentForm(forms.ModelForm):
@@ -128,3 +125,56 @@ class PaymentForm(forms.ModelForm):
         cleaned_data = super().clean()
         # Vous pouvez ajouter des validations supplémentaires ici si nécessaire
         return cleaned_data
+
+
+class PaymentExportForm(forms.Form):
+    """Filtres de l'export des paiements"""
+
+    format = forms.ChoiceField(
+        choices=[("csv", "CSV"), ("jsonl", "JSON Lines")], required=False
+    )
+    status = forms.ChoiceField(
+        choices=[("", "Tous")] + Payment.STATUS_CHOICES, required=False
+    )
+    since = forms.DateField(required=False, label="Du")
+    until = forms.DateField(required=False, label="Au")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        since, until = cleaned_data.get("since"), cleaned_data.get("until")
+        if since and until and since > until:
+            raise forms.ValidationError(
+                "La date de début doit précéder la date de fin."
+            )
+        return cleaned_data
+
+
+class PaymentDashboardForm(forms.Form):
+    """Période et granularité du tableau de bord des paiements"""
+
+    # Nombre maximal de périodes affichées
+    MAX_BUCKETS = {PaymentRollup.HOUR: 24 * 31, PaymentRollup.DAY: 366}
+
+    granularity = forms.ChoiceField(
+        choices=PaymentRollup.GRANULARITY_CHOICES, required=False
+    )
+    since = forms.DateField(required=False, label="Du")
+    until = forms.DateField(required=False, label="Au")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        granularity = cleaned_data.get("granularity") or PaymentRollup.DAY
+        until = cleaned_data.get("until") or timezone.localdate()
+        since = cleaned_data.get("since") or until - timedelta(
+            days=1 if granularity == PaymentRollup.HOUR else 29
+        )
+        if since > until:
+            raise forms.ValidationError(
+                "La date de début doit précéder la date de fin."
+            )
+        days = (until - since).days + 1
+        buckets = days * 24 if granularity == PaymentRollup.HOUR else days
+        if buckets > self.MAX_BUCKETS[granularity]:
+            raise forms.ValidationError("La période demandée est trop longue.")
+        cleaned_data.update(granularity=granularity, since=since, until=until)
+        return cleaned_data
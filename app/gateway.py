@@ -0,0 +1,365 @@
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import fasoarzeka
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from fasoarzeka.constants import BASE_URL
+from fasoarzeka.exceptions import ArzekaAuthenticationError, ArzekaPaymentError
+from fasoarzeka.main import _get_shared_client
+from requests.adapters import HTTPAdapter
+
+from app.cache import get_stats, incr_stat
+from app.metrics import record_gateway_error, timed_gateway_call
+from app.models import GatewayToken
+from app.resilience import (
+    CircuitBreaker,
+    GatewayBusyError,
+    RetryBudget,
+    call_with_resilience,
+)
+
+FASOARZEKA_USERNAME = getattr(settings, "FASOARZEKA_USERNAME", None)
+FASOARZEKA_PASSWORD = getattr(settings, "FASOARZEKA_PASSWORD", None)
+# URL de la passerelle, à faire pointer vers le simulateur local (arzeka_stub)
+FASOARZEKA_BASE_URL = getattr(settings, "FASOARZEKA_BASE_URL", BASE_URL)
+# Durée maximale d'une tentative, puis d'un appel nouvelles tentatives comprises
+FASOARZEKA_TIMEOUT = getattr(settings, "FASOARZEKA_TIMEOUT", 10)
+FASOARZEKA_DEADLINE = getattr(settings, "FASOARZEKA_DEADLINE", 25)
+FASOARZEKA_MAX_RETRIES = getattr(settings, "FASOARZEKA_MAX_RETRIES", 2)
+FASOARZEKA_RETRY_BACKOFF = getattr(settings, "FASOARZEKA_RETRY_BACKOFF", 0.2)
+FASOARZEKA_RETRY_BUDGET_RATIO = getattr(settings, "FASOARZEKA_RETRY_BUDGET_RATIO", 0.1)
+FASOARZEKA_BREAKER_THRESHOLD = getattr(settings, "FASOARZEKA_BREAKER_THRESHOLD", 5)
+FASOARZEKA_BREAKER_RECOVERY = getattr(settings, "FASOARZEKA_BREAKER_RECOVERY", 30)
+FASOARZEKA_MAX_INFLIGHT = getattr(settings, "FASOARZEKA_MAX_INFLIGHT", 50)
+# Attente maximale (secondes) d'une place libre avant de refuser un appel
+FASOARZEKA_ADMISSION_WAIT = getattr(settings, "FASOARZEKA_ADMISSION_WAIT", 0)
+# Durée (secondes) pendant laquelle une vérification non définitive est réutilisée
+FASOARZEKA_CHECK_CACHE_TTL = getattr(settings, "FASOARZEKA_CHECK_CACHE_TTL", 5)
+# Le jeton est renouvelé dès qu'il lui reste moins de ce délai (secondes)
+FASOARZEKA_TOKEN_REFRESH_MARGIN = getattr(
+    settings, "FASOARZEKA_TOKEN_REFRESH_MARGIN", 300
+)
+
+# Le client partagé de fasoarzeka refuse un jeton à moins de 2 minutes de
+# son expiration : en deçà, on attend impérativement un nouveau jeton
+_MIN_VALIDITY = 120
+_REFRESH_LEASE = timedelta(seconds=60)
+
+_token_lock = threading.Lock()
+
+gateway_breaker = CircuitBreaker(
+    "arzeka",
+    failure_threshold=FASOARZEKA_BREAKER_THRESHOLD,
+    recovery_timeout=FASOARZEKA_BREAKER_RECOVERY,
+)
+retry_budget = RetryBudget("arzeka", ratio=FASOARZEKA_RETRY_BUDGET_RATIO)
+
+
+def get_client():
+    """Client fasoarzeka partagé du processus, sans nouvelles tentatives internes"""
+    client = _get_shared_client(FASOARZEKA_BASE_URL, FASOARZEKA_TIMEOUT)
+    if not getattr(client, "_single_attempt", False):
+        # La session de fasoarzeka rejoue jusqu'à 3 fois les erreurs 5xx avec
+        # attente : ces tentatives échapperaient au budget et au disjoncteur
+        for prefix in ("http://", "https://"):
+            client._session.mount(prefix, HTTPAdapter(max_retries=0))
+        client._single_attempt = True
+    return client
+
+
+def _remaining(expires_at):
+    if expires_at is None:
+        return 0
+    return (expires_at - timezone.now()).total_seconds()
+
+
+def _apply_token(token):
+    """Installe le jeton partagé dans le client fasoarzeka du processus"""
+    client = get_client()
+    client._token = token.access_token
+    client._token_type = token.token_type
+    client._expires_at = token.expires_at.timestamp()
+
+
+def _refresh_token():
+    """
+    Renouvelle le jeton si ce processus obtient la réservation
+
+    En cas d'échec, la réservation n'est pas levée : la tentative suivante
+    n'aura lieu qu'à son expiration, sans marteler le service d'authentification.
+
+    Returns:
+        bool: True si ce processus a renouvelé le jeton
+    """
+    now = timezone.now()
+    GatewayToken.objects.get_or_create(pk=1)
+    claimed = (
+        GatewayToken.objects.filter(pk=1)
+        .filter(Q(refreshing_until__isnull=True) | Q(refreshing_until__lt=now))
+        .update(refreshing_until=now + _REFRESH_LEASE)
+    )
+    if not claimed:
+        return False
+
+    auth = fasoarzeka.authenticate(
+        FASOARZEKA_USERNAME,
+        FASOARZEKA_PASSWORD,
+        base_url=FASOARZEKA_BASE_URL,
+        timeout=FASOARZEKA_TIMEOUT,
+    )
+    GatewayToken.objects.filter(pk=1).update(
+        access_token=auth["access_token"],
+        token_type=auth.get("token_type") or "Bearer",
+        expires_at=timezone.now() + timedelta(seconds=float(auth["expires_in"])),
+        refreshing_until=None,
+    )
+    return True
+
+
+def ensure_authenticated():
+    """
+    Garantit un jeton Arzeka valide avant un appel à la passerelle
+
+    L'authentification n'a lieu qu'au premier appel (et non au démarrage).
+    Le jeton est partagé entre workers via la table GatewayToken et renouvelé
+    avant son expiration par un seul processus, les autres continuant
+    d'utiliser l'ancien jeton tant qu'il est valide.
+    """
+    client = get_client()
+    if client.is_token_valid(margin_seconds=FASOARZEKA_TOKEN_REFRESH_MARGIN):
+        return
+
+    with _token_lock:
+        deadline = time.monotonic() + FASOARZEKA_TIMEOUT
+        while not client.is_token_valid(margin_seconds=FASOARZEKA_TOKEN_REFRESH_MARGIN):
+            token = GatewayToken.objects.filter(pk=1).first()
+            if _remaining(token and token.expires_at) > FASOARZEKA_TOKEN_REFRESH_MARGIN:
+                _apply_token(token)
+                return
+
+            try:
+                refreshed = _refresh_token()
+            except ArzekaPaymentError:
+                if _remaining(token and token.expires_at) <= _MIN_VALIDITY:
+                    raise
+                refreshed = False
+
+            token = GatewayToken.objects.get(pk=1)
+            if refreshed or _remaining(token.expires_at) > _MIN_VALIDITY:
+                # Jeton encore utilisable pendant qu'un autre processus le renouvelle
+                _apply_token(token)
+                return
+
+            if time.monotonic() > deadline:
+                raise ArzekaAuthenticationError(
+                    "Impossible d'obtenir un jeton d'accès Arzeka."
+                )
+            time.sleep(0.2)
+
+
+# Plafond des appels simultanés du processus, vues synchrones et asynchrones
+# confondues (ces dernières passent par un thread de _executor)
+_gateway_slots = threading.BoundedSemaphore(FASOARZEKA_MAX_INFLIGHT)
+
+
+@contextmanager
+def gateway_slot():
+    """
+    Réserve une place parmi les FASOARZEKA_MAX_INFLIGHT appels simultanés
+
+    Raises:
+        GatewayBusyError: si aucune place ne se libère à temps
+    """
+    if not _gateway_slots.acquire(timeout=FASOARZEKA_ADMISSION_WAIT):
+        raise GatewayBusyError(
+            "Trop de paiements sont en cours de traitement, "
+            "veuillez réessayer dans quelques instants."
+        )
+    try:
+        yield
+    finally:
+        _gateway_slots.release()
+
+
+def _call_gateway(operation, func, *args, idempotent=True):
+    """
+    Appel à la passerelle derrière le plafond d'appels simultanés et le
+    disjoncteur, avec nouvelles tentatives
+    """
+    with gateway_slot():
+        return call_with_resilience(
+            operation,
+            func,
+            *args,
+            breaker=gateway_breaker,
+            budget=retry_budget,
+            max_retries=FASOARZEKA_MAX_RETRIES,
+            backoff=FASOARZEKA_RETRY_BACKOFF,
+            timeout=FASOARZEKA_TIMEOUT,
+            deadline=FASOARZEKA_DEADLINE,
+            idempotent=idempotent,
+        )
+
+
+def _initiate_payment(payment_data):
+    ensure_authenticated()
+    return fasoarzeka.initiate_payment(
+        payment_data, base_url=FASOARZEKA_BASE_URL, timeout=FASOARZEKA_TIMEOUT
+    )
+
+
+def _check_payment(reference):
+    ensure_authenticated()
+    return fasoarzeka.check_payment(
+        reference, base_url=FASOARZEKA_BASE_URL, timeout=FASOARZEKA_TIMEOUT
+    )
+
+
+@timed_gateway_call("initiate_payment")
+def initiate_payment(payment_data: dict):
+    """
+    `fasoarzeka.initiate_payment` précédé de l'authentification paresseuse
+
+    Une initiation n'est rejouée que si la requête n'a pas pu partir, afin de
+    ne pas créer deux paiements côté Arzeka.
+    """
+    return _call_gateway(
+        "initiate_payment", _initiate_payment, payment_data, idempotent=False
+    )
+
+
+@timed_gateway_call("check_payment")
+def check_payment(reference: str):
+    """`fasoarzeka.check_payment` précédé de l'authentification paresseuse"""
+    return _call_gateway("check_payment", _check_payment, reference)
+
+
+# Statuts Arzeka définitifs, mis en cache sans expiration. INCOMPLETE n'en
+# fait pas partie : un paiement échoué peut encore être confirmé
+FINAL_GATEWAY_STATUSES = {"COMPLETED"}
+
+_checks_inflight = {}
+_checks_lock = threading.Lock()
+
+
+def cached_check_payment(reference: str, with_origin=False):
+    """
+    `check_payment` avec cache court et appels simultanés regroupés
+
+    Les vérifications concurrentes d'une même référence dans le processus
+    attendent le résultat d'un seul appel à la passerelle. Le résultat est
+    ensuite gardé FASOARZEKA_CHECK_CACHE_TTL secondes (sans expiration s'il
+    est définitif) dans le cache par défaut.
+
+    Avec `with_origin`, renvoie le couple (réponse, appelée) : `appelée` est
+    vrai seulement si cette demande a réellement interrogé la passerelle.
+    """
+    cache = caches["default"]
+    key = f"arzeka-check:{reference}"
+    payment_data = cache.get(key)
+    if payment_data is not None:
+        incr_stat("check-stats:cached")
+        return (payment_data, False) if with_origin else payment_data
+
+    with _checks_lock:
+        future = _checks_inflight.get(reference)
+        leader = future is None
+        if leader:
+            future = _checks_inflight[reference] = Future()
+    if not leader:
+        incr_stat("check-stats:coalesced")
+        payment_data = future.result(timeout=FASOARZEKA_DEADLINE)
+        return (payment_data, False) if with_origin else payment_data
+
+    try:
+        incr_stat("check-stats:calls")
+        payment_data = check_payment(reference)
+        final = payment_data.get("status") in FINAL_GATEWAY_STATUSES
+        cache.set(key, payment_data, None if final else FASOARZEKA_CHECK_CACHE_TTL)
+        future.set_result(payment_data)
+        return (payment_data, True) if with_origin else payment_data
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _checks_lock:
+            del _checks_inflight[reference]
+
+
+def check_stats():
+    """Appels à la passerelle effectués et évités par cached_check_payment"""
+    return get_stats("check-stats", ["calls", "cached", "coalesced"])
+
+
+# Pool dédié : l'exécuteur par défaut de asyncio est trop petit pour des
+# appels réseau de plusieurs secondes
+_executor = ThreadPoolExecutor(
+    max_workers=FASOARZEKA_MAX_INFLIGHT, thread_name_prefix="arzeka"
+)
+
+
+def _run_in_thread(func, *args):
+    """Exécute `func` dans un thread de _executor puis ferme sa connexion"""
+    try:
+        return func(*args)
+    finally:
+        # Connexion ouverte par le jeton, le disjoncteur ou le budget (cache
+        # en base), propre à ce thread : sans fermeture, chaque thread du
+        # pool garderait la sienne
+        connection.close()
+
+
+# Un sémaphore par boucle d'événements (un worker ASGI = une boucle)
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Retourne le sémaphore limitant les appels passerelle de la boucle courante"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(FASOARZEKA_MAX_INFLIGHT)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def ainitiate_payment(payment_data: dict, timeout: float = None):
+    """
+    Version asynchrone de `fasoarzeka.initiate_payment`
+
+    L'appel HTTP bloquant est exécuté dans un thread afin de ne pas bloquer
+    la boucle d'événements. Le nombre d'appels simultanés est plafonné par
+    FASOARZEKA_MAX_INFLIGHT et chaque appel est limité à `timeout` secondes.
+
+    Un thread ne peut pas être interrompu : après un dépassement de `timeout`,
+    l'appel en cours se poursuit et garde sa place parmi les appels
+    simultanés (gateway_slot), sa réponse étant ignorée. Il se termine au
+    plus FASOARZEKA_DEADLINE secondes après son début, call_with_resilience
+    ne commençant pas de tentative au-delà. Un appel encore en attente d'un
+    thread est, lui, annulé.
+
+    Raises:
+        asyncio.TimeoutError: si la passerelle ne répond pas à temps
+    """
+    timeout = FASOARZEKA_DEADLINE if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    async with _get_semaphore():
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    _executor, _run_in_thread, initiate_payment, payment_data
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError as e:
+            record_gateway_error("initiate_payment", e)
+            raise
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.bench import percentile
+from app.stub import ArzekaStub
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance une passerelle Arzeka simulée (latence, erreurs et webhooks "
+        "configurables) ; pointer FASOARZEKA_BASE_URL vers son adresse"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8100)
+        parser.add_argument(
+            "--min-latency", type=float, default=0.05, help="Secondes par réponse"
+        )
+        parser.add_argument("--max-latency", type=float, default=0.2)
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Part des initiations et vérifications en erreur HTTP 500",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.1,
+            help="Part des paiements notifiés INCOMPLETE",
+        )
+        parser.add_argument(
+            "--webhook-delay",
+            type=float,
+            default=2.0,
+            help="Secondes entre l'initiation et l'appel du webhook",
+        )
+
+    def handle(self, *args, **options):
+        stub = ArzekaStub(
+            host=options["host"],
+            port=options["port"],
+            min_latency=options["min_latency"],
+            max_latency=options["max_latency"],
+            error_rate=options["error_rate"],
+            failure_rate=options["failure_rate"],
+            webhook_delay=options["webhook_delay"],
+        )
+        with stub:
+            self.stdout.write(f"Passerelle simulée à l'écoute sur {stub.url}")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                self.stdout.write("Arrêt demandé")
+
+        timings = [elapsed for elapsed, _ in stub.webhooks]
+        failed = sum(not ok for _, ok in stub.webhooks)
+        self.stdout.write(
+            f"{len(stub.orders)} paiement(s) initié(s), {len(timings)} webhook(s) "
+            f"envoyé(s) dont {failed} en échec, "
+            f"p95 {percentile(timings, 95) * 1000:.1f} ms"
+        )
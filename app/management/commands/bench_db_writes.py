@@ -0,0 +1,180 @@
+import copy
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+
+from app.bench import bench_database, percentile
+from app.models import Payment
+from web.utils import get_reference
+
+SQLITE_PROFILES = {
+    "journal classique": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "CONN_MAX_AGE": 0,
+    },
+    "WAL": {"journal_mode": "WAL", "synchronous": "NORMAL", "CONN_MAX_AGE": 0},
+    "WAL + persistantes": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "CONN_MAX_AGE": 60,
+    },
+}
+SERVER_PROFILES = {
+    "connexion par requête": {"CONN_MAX_AGE": 0},
+    "persistantes": {"CONN_MAX_AGE": 60},
+    "pool": {"CONN_MAX_AGE": 0, "pool": True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les profils de base de données (journal SQLite, connexions "
+        "persistantes, pool) sous écritures concurrentes de formulaires et de "
+        "webhooks, avec des lectures de la liste en parallèle"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requêtes par écrivain"
+        )
+        parser.add_argument(
+            "--busy-timeout",
+            type=float,
+            help="Attente maximale du verrou SQLite (secondes), "
+            "par défaut celle des réglages",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        results = {}
+        with bench_database():
+            settings_dict = connection.settings_dict
+            saved = copy.deepcopy(
+                {key: settings_dict[key] for key in ("CONN_MAX_AGE", "OPTIONS")}
+            )
+            sqlite = connection.vendor == "sqlite"
+            try:
+                for name, profile in (
+                    SQLITE_PROFILES if sqlite else SERVER_PROFILES
+                ).items():
+                    self.apply(profile, saved)
+                    self.stdout.write(f"Profil « {name} »...")
+                    try:
+                        results[name] = self.run()
+                    finally:
+                        if profile.get("pool"):
+                            connection.close_pool()
+            finally:
+                connection.close()
+                settings_dict.update(saved)
+
+        self.stdout.write(
+            f"\n{'profil':<22} {'écritures/s':>12} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'lect. p95':>10} {'erreurs':>8}"
+        )
+        for name, (elapsed, writes, reads, errors) in results.items():
+            self.stdout.write(
+                f"{name:<22} {len(writes) / elapsed:>12.1f} "
+                + " ".join(
+                    f"{percentile(writes, p) * 1000:>8.1f}" for p in (50, 95, 99)
+                )
+                + f" {percentile(reads, 95) * 1000:>10.1f} {errors:>8}"
+            )
+
+    def apply(self, profile, saved):
+        """Applique un profil aux prochaines connexions"""
+        connection.close()
+        settings_dict = connection.settings_dict
+        settings_dict["CONN_MAX_AGE"] = profile["CONN_MAX_AGE"]
+        options = settings_dict["OPTIONS"] = copy.deepcopy(saved["OPTIONS"])
+        if connection.vendor == "sqlite":
+            # journal_mode est conservé dans le fichier : chaque profil le fixe
+            options["init_command"] = (
+                f"PRAGMA journal_mode={profile['journal_mode']};"
+                f"PRAGMA synchronous={profile['synchronous']}"
+            )
+            if self.options["busy_timeout"] is not None:
+                options["timeout"] = self.options["busy_timeout"]
+            # Quitter WAL exige un accès exclusif : changement fait ici, avant
+            # que les threads ne se connectent
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode={profile['journal_mode']}")
+            connection.close()
+        elif profile.get("pool"):
+            options.setdefault("pool", True)
+        else:
+            options.pop("pool", None)
+
+    def run(self):
+        """Lance écrivains et lecteurs ; renvoie durée, mesures et erreurs"""
+        writes, reads, errors = [], [], []
+        done = threading.Event()
+        writers = [
+            threading.Thread(target=self.write, args=(writes, errors))
+            for _ in range(self.options["writers"])
+        ]
+        readers = [
+            threading.Thread(target=self.read, args=(reads, errors, done))
+            for _ in range(self.options["readers"])
+        ]
+        start = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in readers:
+            thread.join()
+        return elapsed, writes, reads, len(errors)
+
+    def write(self, timings, errors):
+        """Création d'un paiement (formulaire) puis sa confirmation (webhook)"""
+        try:
+            for _ in range(self.options["requests"]):
+                start = time.perf_counter()
+                try:
+                    payment = Payment.objects.create(
+                        lastname="Ouedraogo",
+                        firstname="Awa",
+                        phone="22670000000",
+                        amount=1000,
+                        reference=get_reference(),
+                    )
+                    payment.record_gateway_response(
+                        {
+                            "third_party_mapped_order_id": payment.reference,
+                            "third_party_trans_id": f"T{payment.pk}",
+                            "status": "COMPLETED",
+                        },
+                        source="webhook",
+                    )
+                    timings.append(time.perf_counter() - start)
+                except OperationalError as e:
+                    errors.append(e)
+                finally:
+                    # Fin de requête : ferme la connexion si elle n'est pas
+                    # persistante, comme le signal request_finished
+                    close_old_connections()
+        finally:
+            connection.close()
+
+    def read(self, timings, errors, done):
+        """Première page de la liste des paiements, en boucle"""
+        try:
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    list(Payment.objects.order_by("-created_at", "-id")[:11])
+                    timings.append(time.perf_counter() - start)
+                except OperationalError as e:
+                    errors.append(e)
+                finally:
+                    close_old_connections()
+        finally:
+            connection.close()
@@ -0,0 +1,70 @@
+import random
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from app.bench import bench_database, peak_rss, reset_peak_rss
+from app.exports import buffered, export_lines, export_queryset
+from app.models import Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit (lignes/s) et le pic de mémoire de l'export des "
+        "paiements pour des volumes croissants"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+        )
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+
+    def handle(self, *args, **options):
+        with bench_database():
+            seeded = 0
+            self.stdout.write(
+                f"{'lignes':>10} {'durée':>9} {'lignes/s':>10} {'pic RSS':>10}"
+            )
+            for rows in sorted(options["rows"]):
+                self.seed(seeded, rows)
+                seeded = rows
+                # Les données générées ne doivent pas compter dans le pic
+                connection.close()
+                reset_peak_rss()
+                baseline = peak_rss()
+
+                start = time.perf_counter()
+                with open("/dev/null", "w") as output:
+                    output.writelines(
+                        buffered(export_lines(export_queryset(), options["format"]))
+                    )
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{rows:>10} {elapsed:>7.2f} s {rows / elapsed:>10,.0f} "
+                    f"{(peak_rss() - baseline) / 1e6:>+7.1f} Mo"
+                )
+
+    def seed(self, start, end):
+        """Ajoute des paiements jusqu'à en avoir `end`, par lots"""
+        now = timezone.now()
+        created_at = Payment._meta.get_field("created_at")
+        with mock.patch.object(created_at, "auto_now_add", False):
+            for batch in range(start, end, 10_000):
+                Payment.objects.bulk_create(
+                    Payment(
+                        lastname="Ouedraogo",
+                        firstname="Awa",
+                        phone=f"2267{i:07d}",
+                        amount=random.randint(100, 100_000),
+                        status="completed",
+                        reference=f"eTbench{i:09d}",
+                        transaction_id=f"T{i:012d}",
+                        created_at=now - timedelta(seconds=i),
+                    )
+                    for i in range(batch, min(batch + 10_000, end))
+                )
@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlsplit
+
+import requests
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from app.bench import bench_database, percentile
+from app.management.commands.bench_payment_form import FORM_DATA
+from app.models import Payment, PaymentStatusCounter
+from app.ratelimit import LIMITS
+from app.stub import ArzekaStub
+
+FORM, CREATE, WEBHOOK, CHECK, LIST = (
+    "formulaire",
+    "création",
+    "webhook",
+    "vérification",
+    "liste",
+)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge hors ligne du parcours création → webhook → vérification "
+        "→ liste, avec une passerelle Arzeka simulée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--payments", type=int, default=500, help="Nombre de parcours complets"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Utilisateurs simultanés"
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0.0,
+            help="Pause (secondes) entre deux étapes d'un parcours",
+        )
+        parser.add_argument(
+            "--url",
+            help="Application déjà lancée (ex. http://127.0.0.1:8000), configurée "
+            "avec FASOARZEKA_BASE_URL vers la passerelle simulée et un worker "
+            "process_webhooks ; par défaut l'application est servie par ce "
+            "processus sur une base jetable",
+        )
+        parser.add_argument("--gateway-port", type=int, default=0)
+        parser.add_argument("--min-latency", type=float, default=0.05)
+        parser.add_argument("--max-latency", type=float, default=0.2)
+        parser.add_argument("--error-rate", type=float, default=0.0)
+        parser.add_argument("--failure-rate", type=float, default=0.1)
+        parser.add_argument("--webhook-delay", type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        stub = ArzekaStub(
+            port=options["gateway_port"],
+            min_latency=options["min_latency"],
+            max_latency=options["max_latency"],
+            error_rate=options["error_rate"],
+            failure_rate=options["failure_rate"],
+            webhook_delay=options["webhook_delay"],
+        )
+        statuses = None
+        with stub:
+            if options["url"]:
+                self.stdout.write(f"Passerelle simulée : {stub.url}")
+                elapsed = self.drive(options["url"].rstrip("/"))
+                self.wait_webhooks(stub)
+            else:
+                with bench_database():
+                    with self.app_server(stub) as url:
+                        elapsed = self.drive(url)
+                        self.wait_webhooks(stub)
+                    statuses = PaymentStatusCounter.get_counts()
+
+        for elapsed_webhook, ok in stub.webhooks:
+            self.record(WEBHOOK, elapsed_webhook, ok)
+        self.report(elapsed, statuses)
+
+    @contextmanager
+    def app_server(self, stub):
+        """Sert l'application dans ce processus, reliée à la passerelle simulée"""
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler)
+        server.set_app(get_wsgi_application())
+        host, port = server.server_address[:2]
+        url = f"http://{host}:{port}"
+        stop = threading.Event()
+        worker = threading.Thread(target=self.process_webhooks, args=(stop,))
+
+        # Tous les utilisateurs simulés partagent l'IP 127.0.0.1 : les
+        # limites de débit sont levées
+        unlimited = mock.patch.dict(LIMITS, dict.fromkeys(LIMITS, (None, None)))
+        with unlimited, mock.patch(
+            "app.gateway.FASOARZEKA_BASE_URL", stub.url
+        ), mock.patch("app.views.PAYMENT_CALLBACK_URL", url), override_settings(
+            ALLOWED_HOSTS=[host]
+        ):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            worker.start()
+            try:
+                yield url
+            finally:
+                stop.set()
+                worker.join()
+                server.shutdown()
+                server.server_close()
+
+    def process_webhooks(self, stop):
+        """Applique les notifications reçues, comme le worker process_webhooks"""
+        try:
+            while True:
+                stopping = stop.is_set()
+                call_command("process_webhooks", once=True, stdout=StringIO())
+                if stopping:
+                    break
+                stop.wait(0.2)
+        finally:
+            connection.close()
+
+    def wait_webhooks(self, stub):
+        """Attend que chaque paiement initié ait été notifié"""
+        deadline = time.monotonic() + self.options["webhook_delay"] + 30
+        while len(stub.webhooks) < len(stub.orders) and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+    def drive(self, base_url):
+        """Exécute les parcours avec `concurrency` utilisateurs simultanés"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options["concurrency"]) as executor:
+            for _ in executor.map(self.flow, [base_url] * self.options["payments"]):
+                pass
+        return time.perf_counter() - start
+
+    def flow(self, base_url):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        session = self.local.session
+        form_url = base_url + reverse("app:payment-form")
+        think_time = self.options["think_time"]
+
+        try:
+            self.request(session, FORM, 200, "GET", form_url)
+            data = {
+                **FORM_DATA,
+                "csrfmiddlewaretoken": session.cookies.get("csrftoken"),
+            }
+            response = self.request(session, CREATE, 302, "POST", form_url, data=data)
+            if response is None:
+                return
+            location = urlsplit(response.headers["Location"]).path
+            reference = Payment.objects.values_list("reference", flat=True).get(
+                pk=resolve(location).kwargs["payment_id"]
+            )
+
+            time.sleep(think_time)
+            self.request(
+                session,
+                CHECK,
+                302,
+                "GET",
+                base_url + reverse("app:check-payment-status"),
+                params={"paymentRequestID": reference},
+            )
+            time.sleep(think_time)
+            self.request(
+                session, LIST, 200, "GET", base_url + reverse("app:payment-list")
+            )
+        finally:
+            connection.close()
+
+    def request(self, session, name, expected, method, url, **kwargs):
+        """Envoie une requête et enregistre sa durée ; None en cas d'erreur"""
+        start = time.perf_counter()
+        try:
+            response = session.request(
+                method, url, allow_redirects=False, timeout=60, **kwargs
+            )
+        except requests.RequestException:
+            response = None
+        ok = response is not None and response.status_code == expected
+        self.record(name, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def record(self, name, elapsed, ok):
+        with self.lock:
+            self.timings[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def report(self, elapsed, statuses):
+        self.stdout.write(
+            f"{self.options['payments']} parcours, {self.options['concurrency']} "
+            f"utilisateurs simultanés, {elapsed:.1f} s"
+        )
+        self.stdout.write(
+            f"\n{'étape':<14} {'requêtes':>9} {'erreurs':>8} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for name in (FORM, CREATE, WEBHOOK, CHECK, LIST):
+            timings = self.timings[name]
+            self.stdout.write(
+                f"{name:<14} {len(timings):>9} {self.errors[name]:>8} "
+                f"{len(timings) / elapsed:>8.1f} "
+                + " ".join(
+                    f"{percentile(timings, p) * 1000:>8.1f}" for p in (50, 95, 99)
+                )
+            )
+        if statuses is not None:
+            self.stdout.write(
+                "\nStatuts finaux : "
+                + ", ".join(
+                    f"{status} {count}"
+                    for status, count in statuses.items()
+                    if status != "total"
+                )
+            )
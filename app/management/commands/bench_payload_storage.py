@@ -0,0 +1,161 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app.bench import bench_database
+from app.models import Payment, PaymentPayload
+
+
+def gateway_payloads(i):
+    """Réponses factices ayant la forme de celles d'Arzeka"""
+    reference = f"eTbench{i:09d}"
+    request_data = {
+        "amount": random.randint(100, 100_000),
+        "merchant_id": "MERCHANT-TEST",
+        "additional_info": {
+            "first_name": "Awa",
+            "last_name": "Ouedraogo",
+            "mobile": f"2267{i:07d}",
+        },
+        "hash_secret": "x" * 64,
+        "link_for_update_status": "https://example.org/payments/update-status/",
+        "link_back_to_calling_website": "https://example.org/payments/",
+        "mapped_order_id": reference,
+    }
+    response = {
+        "status": "COMPLETED",
+        "mappedOrderId": reference,
+        "url": f"https://pay.arzeka.bf/checkout/{reference}",
+        "message": "Paiement initié avec succès",
+    }
+    final = {**response, "third_party_trans_id": f"T{i:012d}", "amount": 1000}
+    return request_data, response, final
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la taille et le temps de lecture des réponses de la passerelle "
+        "stockées en JSON dans Payment ou compressées dans PaymentPayload"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1:
+            raise CommandError("--rows doit être au moins 1")
+        with bench_database():
+            self.seed(options["rows"])
+            with connection.cursor() as cursor:
+                inline = self.table_size(cursor, "bench_payment_inline")
+                payment = self.table_size(cursor, Payment._meta.db_table)
+                payload = self.table_size(cursor, PaymentPayload._meta.db_table)
+
+                queries = {
+                    "liste (JSON dans la ligne)": "SELECT * FROM bench_payment_inline "
+                    "ORDER BY id DESC LIMIT 1000",
+                    "liste (sans les réponses)": "SELECT * FROM "
+                    f"{Payment._meta.db_table} ORDER BY id DESC LIMIT 1000",
+                    "parcours complet (JSON dans la ligne)": "SELECT count(*), "
+                    "sum(amount) FROM bench_payment_inline WHERE status = 'pending'",
+                    "parcours complet (sans les réponses)": "SELECT count(*), "
+                    f"sum(amount) FROM {Payment._meta.db_table} "
+                    "WHERE status = 'pending'",
+                }
+                timings = {
+                    name: self.measure(cursor, sql, options["repeat"])
+                    for name, sql in queries.items()
+                }
+
+            # Au plus 1000 lectures, moins si --rows est plus petit
+            sample = random.sample(
+                range(1, options["rows"] + 1), min(1000, options["rows"])
+            )
+            start = time.perf_counter()
+            for payment_id in sample:
+                Payment.objects.get(pk=payment_id).final_response
+            detail = (time.perf_counter() - start) / len(sample)
+
+        self.stdout.write(f"JSON dans Payment       : {inline / 1e6:>8.1f} Mo")
+        self.stdout.write(
+            f"Payment + PaymentPayload: {payment / 1e6:>7.1f} Mo "
+            f"+ {payload / 1e6:.1f} Mo compressés"
+        )
+        for name, elapsed in timings.items():
+            self.stdout.write(f"{name:<40} {elapsed * 1000:>9.2f} ms")
+        self.stdout.write(
+            f"{'détail (décompression comprise)':<40} {detail * 1000:>9.2f} ms"
+        )
+
+    def seed(self, rows):
+        self.stdout.write(f"Génération de {rows} paiements...")
+        payments, payloads, inline = [], [], []
+        for i in range(1, rows + 1):
+            request_data, response, final = gateway_payloads(i)
+            payments.append(
+                Payment(
+                    id=i,
+                    lastname="Ouedraogo",
+                    firstname="Awa",
+                    phone=f"2267{i:07d}",
+                    amount=request_data["amount"],
+                    status="completed",
+                    reference=response["mappedOrderId"],
+                )
+            )
+            payloads.append(
+                PaymentPayload(
+                    payment_id=i,
+                    request_data=request_data,
+                    intermediary_response=response,
+                    final_response=final,
+                )
+            )
+            inline.append(
+                (
+                    i,
+                    request_data["amount"],
+                    "completed",
+                    json.dumps(request_data),
+                    json.dumps(response),
+                    json.dumps(final),
+                )
+            )
+        Payment.objects.bulk_create(payments, batch_size=5000)
+        PaymentPayload.objects.bulk_create(payloads, batch_size=5000)
+
+        # Copie de l'ancien schéma : réponses JSON dans la ligne du paiement
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bench_payment_inline ("
+                "id integer PRIMARY KEY, amount integer, status varchar(20), "
+                "request_data text, intermediary_response text, final_response text)"
+            )
+            cursor.executemany(
+                "INSERT INTO bench_payment_inline VALUES (%s, %s, %s, %s, %s, %s)",
+                inline,
+            )
+            cursor.execute("ANALYZE")
+
+    @staticmethod
+    def table_size(cursor, table):
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+        else:
+            cursor.execute("SELECT sum(pgsize) FROM dbstat WHERE name = %s", [table])
+        return cursor.fetchone()[0] or 0
+
+    @staticmethod
+    def measure(cursor, sql, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cursor.execute(sql)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,87 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from app.bench import bench_database
+from app.ratelimit import LIMITS
+
+FORM_DATA = {
+    "lastname": "Ouedraogo",
+    "firstname": "Awa",
+    "phone": "+22670000000",
+    "amount": "1000",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit (requêtes/s) de PaymentFormView et AsyncPaymentFormView "
+        "avec une passerelle simulée lente"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Nombre de threads simulant les workers WSGI de la vue synchrone",
+        )
+        parser.add_argument("--min-delay", type=float, default=1.0)
+        parser.add_argument("--max-delay", type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        min_delay, max_delay = options["min_delay"], options["max_delay"]
+
+        def slow_initiate_payment(payment_data):
+            time.sleep(random.uniform(min_delay, max_delay))
+            return {"url": "https://pgw-test.fasoarzeka.bf/pay"}, payment_data
+
+        # Toutes les requêtes viennent de la même IP : limites de débit levées
+        unlimited = mock.patch.dict(LIMITS, dict.fromkeys(LIMITS, (None, None)))
+        with bench_database(), unlimited, mock.patch(
+            "app.views.initiate_payment", slow_initiate_payment
+        ), mock.patch("app.gateway.initiate_payment", slow_initiate_payment):
+            sync_elapsed, sync_ok = self.run_sync(
+                options["requests"], options["workers"]
+            )
+            async_elapsed, async_ok = asyncio.run(self.run_async(options["requests"]))
+
+        n = options["requests"]
+        self.stdout.write(
+            f"Passerelle simulée: {min_delay:.1f}-{max_delay:.1f} s, {n} requêtes"
+        )
+        self.stdout.write(
+            f"sync  ({options['workers']} workers): {n / sync_elapsed:8.2f} req/s "
+            f"({sync_ok}/{n} OK, {sync_elapsed:.1f} s)"
+        )
+        self.stdout.write(
+            f"async (1 boucle)   : {n / async_elapsed:8.2f} req/s "
+            f"({async_ok}/{n} OK, {async_elapsed:.1f} s)"
+        )
+
+    def run_sync(self, n, workers):
+        url = reverse("app:payment-form")
+
+        def submit(_):
+            return Client().post(url, FORM_DATA).status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            codes = list(executor.map(submit, range(n)))
+        return time.perf_counter() - start, codes.count(302)
+
+    async def run_async(self, n):
+        url = reverse("app:payment-form-async")
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(AsyncClient().post(url, FORM_DATA) for _ in range(n))
+        )
+        codes = [response.status_code for response in responses]
+        return time.perf_counter() - start, codes.count(302)
@@ -0,0 +1,119 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from app.bench import bench_database
+from app.management.commands.reconcile_payments import Command as ReconcileCommand
+from app.models import Payment
+
+STATUS_WEIGHTS = {
+    "completed": 84,
+    "failed": 10,
+    "cancelled": 4,
+    "pending": 1.5,
+    "processing": 0.5,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère N paiements puis mesure et explique les requêtes des vues, "
+        "sans puis avec les index de Payment"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--explain", action="store_true", help="Afficher les plans d'exécution"
+        )
+
+    def handle(self, *args, **options):
+        with bench_database():
+            self.stdout.write(f"Génération de {options['rows']} paiements...")
+            self.seed(options["rows"])
+
+            indexes = Payment._meta.indexes
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Payment, index)
+            before = self.measure(options)
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Payment, index)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            after = self.measure(options)
+
+        self.stdout.write(f"\n{'requête':<32} {'sans index':>12} {'avec index':>12}")
+        for name, (elapsed, plan) in before.items():
+            self.stdout.write(
+                f"{name:<32} {elapsed * 1000:>9.2f} ms {after[name][0] * 1000:>9.2f} ms"
+            )
+            if options["explain"]:
+                self.stdout.write(f"  sans: {plan}\n  avec: {after[name][1]}")
+
+    def seed(self, rows):
+        now = timezone.now()
+        statuses = random.choices(
+            list(STATUS_WEIGHTS), weights=STATUS_WEIGHTS.values(), k=rows
+        )
+        # created_at est auto_now_add : on le désactive pour étaler les dates
+        created_at = Payment._meta.get_field("created_at")
+        with mock.patch.object(created_at, "auto_now_add", False):
+            Payment.objects.bulk_create(
+                (
+                    Payment(
+                        lastname="Ouedraogo",
+                        firstname="Awa",
+                        phone=f"2267{i:07d}",
+                        amount=random.randint(100, 100_000),
+                        status=status,
+                        reference=f"eTbench{i:09d}",
+                        created_at=now
+                        - timedelta(seconds=random.randint(0, 31_536_000)),
+                    )
+                    for i, status in enumerate(statuses)
+                ),
+                batch_size=5000,
+            )
+
+    def queries(self):
+        """Requêtes émises par la liste, l'admin et la réconciliation"""
+        now = timezone.now()
+        reconcile = ReconcileCommand()
+        reconcile.options = {"stale_after": 300}
+        ordered = Payment.objects.order_by("-created_at", "-id")
+        offset = Payment.objects.count() * 9 // 10
+        deep = ordered.values("created_at", "id")[offset]
+        return {
+            "liste: 1re page": ordered[:11],
+            "liste: page profonde (curseur)": ordered.filter(
+                created_at__lte=deep["created_at"]
+            ).filter(Q(created_at__lt=deep["created_at"]) | Q(id__lt=deep["id"]))[:11],
+            "liste: page profonde (OFFSET)": ordered[offset : offset + 10],
+            "admin: filtre statut": Payment.objects.filter(status="pending").order_by(
+                "-created_at"
+            )[:20],
+            "réconciliation: paiements dus": reconcile.due_payments(now, 0)[:500],
+        }
+
+    def measure(self, options):
+        results = {}
+        for name, queryset in self.queries().items():
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            plan = " | ".join(queryset.explain().splitlines())
+            results[name] = (statistics.median(timings), plan)
+        return results
@@ -0,0 +1,81 @@
+import heapq
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from web.utils import get_reference
+
+
+def generate(args):
+    """Génère `count` références dans un fichier (processus fils)"""
+    count, path = args
+    start = time.perf_counter()
+    with open(path, "w") as output:
+        output.writelines(f"{get_reference()}\n" for _ in range(count))
+    return count / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère des millions de références dans plusieurs processus et vérifie "
+        "qu'il n'y a aucun doublon"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 4)
+        parser.add_argument(
+            "--count", type=int, default=1_000_000, help="Références par processus"
+        )
+
+    def handle(self, *args, **options):
+        processes, count = options["processes"], options["count"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"{i}.txt") for i in range(processes)]
+            start = time.perf_counter()
+            # Initialise le générateur avant le fork : chaque worker en hérite,
+            # comme avec gunicorn --preload, et doit changer de noeud
+            get_reference()
+            with multiprocessing.get_context("fork").Pool(processes) as pool:
+                rates = pool.map(generate, [(count, path) for path in paths])
+            elapsed = time.perf_counter() - start
+
+            # Chaque fichier est trié (références monotones) : une fusion
+            # suffit pour détecter les doublons en mémoire constante
+            for path in paths:
+                if not self.is_sorted(path):
+                    raise CommandError(f"Références non triées dans {path}")
+
+            files = [open(path) for path in paths]
+            try:
+                total, duplicates, previous = 0, 0, None
+                for reference in heapq.merge(*files):
+                    total += 1
+                    if reference == previous:
+                        duplicates += 1
+                    previous = reference
+            finally:
+                for lines in files:
+                    lines.close()
+
+        self.stdout.write(
+            f"{total} références, {processes} processus, {elapsed:.1f} s "
+            f"({total / elapsed:,.0f}/s au total, {min(rates):,.0f}/s par processus)"
+        )
+        if duplicates:
+            raise CommandError(f"{duplicates} doublon(s) détecté(s)")
+        self.stdout.write(self.style.SUCCESS("Aucun doublon"))
+
+    @staticmethod
+    def is_sorted(path):
+        """Vérifie que les références d'un processus sont strictement croissantes"""
+        with open(path) as lines:
+            previous = ""
+            for line in lines:
+                if line <= previous:
+                    return False
+                previous = line
+        return True
@@ -0,0 +1,48 @@
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+LAZY = "import django; django.setup()"
+
+# Comportement précédent : AppConfig.ready() s'authentifiait au démarrage
+EAGER = """
+import django; django.setup()
+from django.conf import settings
+import fasoarzeka
+try:
+    fasoarzeka.authenticate(settings.FASOARZEKA_USERNAME, settings.FASOARZEKA_PASSWORD)
+except Exception as e:
+    print(type(e).__name__)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le temps de démarrage à froid d'un processus Django avec "
+        "authentification paresseuse et avec authentification au démarrage"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        for label, code in (("paresseuse", LAZY), ("au démarrage", EAGER)):
+            timings, failures = [], 0
+            for _ in range(options["runs"]):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, "-c", code],
+                    cwd=settings.BASE_DIR,
+                    capture_output=True,
+                    text=True,
+                )
+                timings.append(time.perf_counter() - start)
+                failures += bool(result.returncode or result.stdout.strip())
+            self.stdout.write(
+                f"authentification {label:<13}: médiane {statistics.median(timings):.3f} s, "
+                f"max {max(timings):.3f} s, {failures}/{options['runs']} échec(s)"
+            )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from app.cache import fragment_stats
+from app.gateway import check_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche les compteurs des fragments HTML (tous workers confondus avec "
+        "PROMETHEUS_MULTIPROC_DIR) et des vérifications de statut (cache par "
+        "défaut, partagé)"
+    )
+
+    def handle(self, *args, **options):
+        stats = fragment_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(
+            f"Fragments : {stats['hits']} hit(s), {stats['misses']} miss(es), "
+            f"taux de succès {ratio:.1%}"
+        )
+
+        stats = check_stats()
+        self.stdout.write(
+            f"Vérifications passerelle : {stats['calls']} appel(s), "
+            f"{stats['cached'] + stats['coalesced']} évité(s) "
+            f"({stats['cached']} en cache, {stats['coalesced']} regroupé(s))"
+        )
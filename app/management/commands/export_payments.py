@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exports import buffered, export_lines, export_queryset
+from app.forms import PaymentExportForm
+
+
+class Command(BaseCommand):
+    help = "Exporte les paiements en CSV ou JSONL, en flux (mémoire constante)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--status", help="Filtrer sur un statut")
+        parser.add_argument("--since", help="Date de création minimale (AAAA-MM-JJ)")
+        parser.add_argument("--until", help="Date de création maximale (AAAA-MM-JJ)")
+        parser.add_argument(
+            "--output", "-o", default="-", help="Fichier de sortie (- pour stdout)"
+        )
+
+    def handle(self, *args, **options):
+        form = PaymentExportForm(
+            {name: options[name] for name in ("format", "status", "since", "until")}
+        )
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        queryset = export_queryset(
+            form.cleaned_data["status"],
+            form.cleaned_data["since"],
+            form.cleaned_data["until"],
+        )
+        chunks = buffered(export_lines(queryset, options["format"]))
+        if options["output"] == "-":
+            sys.stdout.writelines(chunks)
+        else:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(chunks)
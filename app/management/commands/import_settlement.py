@@ -0,0 +1,204 @@
+import csv
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from app.cache import invalidate_fragments
+from app.models import Payment, PaymentEvent
+from web.utils import convert_arzeka_payment_status
+
+REPORT_FIELDS = ["line", "reference", "issue", "settlement", "payment"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Rapproche un relevé de règlement Arzeka (CSV) des paiements : met à "
+        "jour statuts et références de transaction, et produit un rapport des "
+        "écarts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Relevé de règlement au format CSV")
+        parser.add_argument(
+            "--report",
+            default="settlement-mismatches.csv",
+            help="Fichier CSV du rapport des écarts",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--delimiter", default=",")
+        parser.add_argument("--reference-column", default="mapped_order_id")
+        parser.add_argument("--transaction-column", default="third_party_trans_id")
+        parser.add_argument("--amount-column", default="amount")
+        parser.add_argument("--status-column", default="status")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Produire le rapport sans modifier les paiements",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.totals = defaultdict(int)
+
+        with open(options["file"], newline="", encoding="utf-8-sig") as source:
+            reader = csv.DictReader(source, delimiter=options["delimiter"])
+            columns = [
+                options[f"{name}_column"]
+                for name in ("reference", "transaction", "amount", "status")
+            ]
+            # Vérifié avant d'ouvrir (et de vider) le rapport précédent
+            missing = set(columns) - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(f"Colonnes absentes du relevé : {sorted(missing)}")
+
+            with open(options["report"], "w", newline="", encoding="utf-8") as report:
+                self.report = csv.writer(report)
+                self.report.writerow(REPORT_FIELDS)
+                # Numéros de ligne du fichier (l'en-tête est la ligne 1)
+                rows = enumerate(reader, start=2)
+                while batch := list(islice(rows, options["batch_size"])):
+                    self.process_batch(batch)
+                    self.stdout.write(f"{self.totals['rows']} ligne(s) traitée(s)...")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{self.totals['rows']} ligne(s) : {self.totals['updated']} "
+                f"paiement(s) mis à jour, {self.totals['missing']} absent(s), "
+                f"{self.totals['amount']} montant(s) différent(s), "
+                f"{self.totals['status']} statut(s) différent(s), "
+                f"{self.totals['transaction_id']} référence(s) de transaction "
+                f"différente(s), {self.totals['duplicate']} référence(s) de "
+                "transaction déjà attribuée(s)"
+            )
+        )
+        self.stdout.write(f"Rapport des écarts : {options['report']}")
+
+    def process_batch(self, batch):
+        """Rapproche un lot de lignes avec une seule requête de lecture"""
+        options = self.options
+        payments = Payment.objects.only(
+            "id", "reference", "amount", "status", "transaction_id"
+        ).in_bulk(
+            {row[options["reference_column"]] for _, row in batch},
+            field_name="reference",
+        )
+        # Référence de transaction -> paiement qui la porte déjà (unique) :
+        # un doublon est signalé ligne par ligne au lieu d'interrompre l'import
+        owners = dict(
+            Payment.objects.filter(
+                transaction_id__in={
+                    row[options["transaction_column"]]
+                    for _, row in batch
+                    if row[options["transaction_column"]]
+                }
+            ).values_list("transaction_id", "reference")
+        )
+
+        with_transaction_id, events = [], []
+        transitions = defaultdict(list)
+        for line, row in batch:
+            self.totals["rows"] += 1
+            reference = row[options["reference_column"]]
+            payment = payments.get(reference)
+            if payment is None:
+                self.mismatch(line, reference, "missing", reference, "")
+                continue
+
+            # Comparaison exacte : 1000.50 ne correspond pas à 1000
+            amount = self.parse_amount(row[options["amount_column"]])
+            if amount != payment.amount:
+                # Montant incohérent : rien n'est appliqué sans vérification
+                self.mismatch(
+                    line,
+                    reference,
+                    "amount",
+                    row[options["amount_column"]],
+                    payment.amount,
+                )
+                continue
+
+            status = convert_arzeka_payment_status(row[options["status_column"]])
+            transaction_id = row[options["transaction_column"]] or None
+            if status == payment.status:
+                pass
+            elif status in Payment.ALLOWED_TRANSITIONS[payment.status]:
+                transitions[(payment.status, status)].append(payment.pk)
+                events.append(
+                    PaymentEvent(
+                        payment=payment, source="settlement", status=status, payload=row
+                    )
+                )
+                # Une ligne répétée ne rejoue pas la transition
+                payment.status = status
+            else:
+                self.mismatch(line, reference, "status", status, payment.status)
+                continue
+
+            if status != "completed" or not transaction_id:
+                continue
+            owner = owners.get(transaction_id, reference)
+            if owner != reference:
+                self.mismatch(line, reference, "duplicate", transaction_id, owner)
+            elif payment.transaction_id is None:
+                payment.transaction_id = transaction_id
+                owners[transaction_id] = reference
+                with_transaction_id.append(payment)
+            elif payment.transaction_id != transaction_id:
+                self.mismatch(
+                    line,
+                    reference,
+                    "transaction_id",
+                    transaction_id,
+                    payment.transaction_id,
+                )
+
+        if options["dry_run"]:
+            self.totals["updated"] += sum(len(ids) for ids in transitions.values())
+            return
+
+        with transaction.atomic():
+            requested, transitioned = set(), set()
+            for (previous, status), ids in transitions.items():
+                # Transition conditionnelle : un paiement modifié entre-temps
+                # (webhook, réconciliation) n'est pas écrasé
+                requested.update(ids)
+                transitioned.update(Payment.bulk_transition(ids, previous, status))
+            self.totals["updated"] += len(transitioned)
+            # Référence de transaction et événement seulement pour les
+            # paiements effectivement passés au statut du relevé
+            skipped = requested - transitioned
+            with_transaction_id = [
+                payment for payment in with_transaction_id if payment.pk not in skipped
+            ]
+            events = [event for event in events if event.payment_id not in skipped]
+
+            # updated_at fait partie de la version du fragment de détail
+            now = timezone.now()
+            for payment in with_transaction_id:
+                payment.updated_at = now
+            Payment.objects.bulk_update(
+                with_transaction_id, ["transaction_id", "updated_at"], batch_size=500
+            )
+            PaymentEvent.objects.bulk_create(events)
+            invalidate_fragments(
+                "payment-detail",
+                *{payment.pk for payment in with_transaction_id},
+                *(event.payment_id for event in events),
+            )
+
+    def mismatch(self, line, reference, issue, settlement, payment):
+        self.totals[issue] += 1
+        self.report.writerow([line, reference, issue, settlement, payment])
+
+    @staticmethod
+    def parse_amount(value):
+        """Montant du relevé en Decimal, None s'il est illisible (NaN, infini…)"""
+        try:
+            amount = Decimal(value.replace(" ", "").replace(",", "."))
+        except (InvalidOperation, AttributeError):
+            return None
+        return amount if amount.is_finite() else None
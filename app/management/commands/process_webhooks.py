@@ -0,0 +1,212 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.gateway import check_payment
+from app.models import Payment, WebhookDeadLetter, WebhookJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite par lots les notifications Arzeka mises en file par le webhook "
+        "en revérifiant le statut auprès de la passerelle, avec nouvelles "
+        "tentatives et file des notifications abandonnées"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Nombre maximal de vérifications simultanées auprès de la passerelle",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=8,
+            help="Nombre de tentatives avant abandon d'une notification",
+        )
+        parser.add_argument(
+            "--retry-delay",
+            type=int,
+            default=30,
+            help="Délai (secondes) avant la première nouvelle tentative, doublé ensuite",
+        )
+        parser.add_argument(
+            "--lease",
+            type=int,
+            default=300,
+            help="Durée (secondes) après laquelle un lot non terminé est repris",
+        )
+        parser.add_argument(
+            "--retention",
+            type=int,
+            default=7,
+            help="Durée (jours) de conservation des notifications traitées ou "
+            "abandonnées, pendant laquelle les doublons sont ignorés",
+        )
+        parser.add_argument("--interval", type=float, default=1.0)
+        parser.add_argument(
+            "--once", action="store_true", help="Vider la file puis quitter"
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.executor = ThreadPoolExecutor(
+            max_workers=options["workers"], thread_name_prefix="webhooks"
+        )
+        try:
+            while True:
+                processed = self.process_batch()
+                if not processed:
+                    self.purge()
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé")
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    def claim_batch(self):
+        """
+        Réserve un lot de notifications pour ce worker
+
+        La réservation est un UPDATE conditionnel sur le statut, ce qui permet
+        de lancer plusieurs workers sans verrou de ligne.
+        """
+        now = timezone.now()
+        lease_expired = now - timedelta(seconds=self.options["lease"])
+        ids = list(
+            WebhookJob.objects.filter(
+                Q(status="pending", available_at__lte=now)
+                | Q(status="processing", claimed_at__lt=lease_expired)
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[: self.options["batch_size"]]
+        )
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        WebhookJob.objects.filter(
+            Q(status="pending") | Q(status="processing", claimed_at__lt=lease_expired),
+            id__in=ids,
+        ).update(status="processing", claimed_by=token, claimed_at=now)
+        return list(WebhookJob.objects.filter(claimed_by=token).order_by("id"))
+
+    def process_batch(self):
+        jobs = self.claim_batch()
+        if not jobs:
+            return 0
+
+        payments = Payment.objects.in_bulk(
+            {job.reference for job in jobs}, field_name="reference"
+        )
+        # La notification n'est pas authentifiée : elle déclenche une
+        # vérification auprès de la passerelle, une seule par référence et par
+        # lot, menées en parallèle ; le statut obtenu est ensuite appliqué
+        references = list(payments)
+        errors = {}
+        for reference, (payment_data, error) in zip(
+            references, self.executor.map(self.fetch_status, references)
+        ):
+            if error is None:
+                try:
+                    payments[reference].record_gateway_response(
+                        payment_data, source="webhook"
+                    )
+                except Exception as e:
+                    error = e
+            if error is not None:
+                errors[reference] = f"{type(error).__name__}: {error}"
+
+        done, failed = [], []
+        for job in jobs:
+            if job.reference not in payments:
+                errors[job.reference] = (
+                    f"DoesNotExist: La référence {job.reference} n'existe pas"
+                )
+            if job.reference in errors:
+                job.last_error = errors[job.reference]
+                failed.append(job)
+            else:
+                done.append(job)
+
+        self.finish(done, failed)
+        self.stdout.write(
+            f"{len(done)} notification(s) traitée(s), {len(failed)} échec(s)"
+        )
+        return len(jobs)
+
+    def fetch_status(self, reference):
+        """(réponse, None) ou (None, exception) d'une vérification"""
+        try:
+            return check_payment(reference), None
+        except Exception as e:
+            return None, e
+        finally:
+            # Connexion ouverte par l'authentification et le cache en base,
+            # propre à ce thread du pool
+            connection.close()
+
+    def finish(self, done, failed):
+        """Enregistre l'issue du lot en requêtes groupées"""
+        now = timezone.now()
+        dead = []
+        for job in failed:
+            job.attempts += 1
+            job.claimed_by = ""
+            if job.attempts >= self.options["max_attempts"]:
+                job.status = "dead"
+                # Libère l'empreinte : une nouvelle notification identique
+                # doit pouvoir être mise en file
+                job.payload_hash = f"dead:{job.pk}"
+                dead.append(
+                    WebhookDeadLetter(
+                        job=job,
+                        reference=job.reference,
+                        payload=job.payload,
+                        attempts=job.attempts,
+                        error=job.last_error,
+                    )
+                )
+            else:
+                job.status = "pending"
+                job.available_at = now + timedelta(
+                    seconds=self.options["retry_delay"] * 2 ** (job.attempts - 1)
+                )
+
+        with transaction.atomic():
+            WebhookJob.objects.filter(id__in=[job.id for job in done]).update(
+                status="done", claimed_by="", last_error=""
+            )
+            WebhookJob.objects.bulk_update(
+                failed,
+                [
+                    "status",
+                    "attempts",
+                    "available_at",
+                    "last_error",
+                    "claimed_by",
+                    "payload_hash",
+                ],
+            )
+            WebhookDeadLetter.objects.bulk_create(dead)
+
+    def purge(self):
+        """
+        Supprime les notifications traitées ou abandonnées au-delà de la durée
+        de rétention (avec leur entrée dans la file des abandons)
+        """
+        limit = timezone.now() - timedelta(days=self.options["retention"])
+        WebhookJob.objects.filter(
+            status__in=["done", "dead"], created_at__lt=limit
+        ).delete()
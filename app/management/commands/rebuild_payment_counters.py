@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from app.models import Payment, PaymentStatusCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les compteurs de paiements par statut à partir de la table "
+        "Payment et signale les écarts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Signaler les écarts sans corriger (code de sortie non nul si écart)",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Verrouille les compteurs pour ne pas perdre d'incrément concurrent
+            stored = dict(
+                PaymentStatusCounter.objects.select_for_update().values_list(
+                    "status", "count"
+                )
+            )
+            actual = dict(
+                Payment.objects.order_by()
+                .values("status")
+                .annotate(count=Count("id"))
+                .values_list("status", "count")
+            )
+
+            drift = {
+                status: (stored.get(status, 0), actual.get(status, 0))
+                for status in stored.keys() | actual.keys()
+                if stored.get(status, 0) != actual.get(status, 0)
+            }
+            for status, (expected, found) in sorted(drift.items()):
+                self.stdout.write(f"{status}: compteur={expected}, réel={found}")
+
+            if options["check"]:
+                if drift:
+                    raise CommandError(f"{len(drift)} compteur(s) en écart")
+                self.stdout.write(self.style.SUCCESS("Aucun écart"))
+                return
+
+            for status, count in actual.items():
+                PaymentStatusCounter.objects.update_or_create(
+                    status=status, defaults={"count": count}
+                )
+            PaymentStatusCounter.objects.exclude(status__in=actual).update(count=0)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Compteurs reconstruits ({len(drift)} écart(s) corrigé(s))"
+            )
+        )
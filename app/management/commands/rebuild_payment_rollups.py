@@ -0,0 +1,130 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from app.dashboard import day_bounds
+from app.models import Payment, PaymentRollup
+
+TRUNCATIONS = {PaymentRollup.HOUR: TruncHour, PaymentRollup.DAY: TruncDay}
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les agrégats horaires et journaliers des paiements d'une "
+        "période à partir de la table Payment et signale les écarts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="Premier jour (AAAA-MM-JJ), par défaut le premier paiement",
+        )
+        parser.add_argument(
+            "--until",
+            type=date.fromisoformat,
+            help="Dernier jour inclus (AAAA-MM-JJ), par défaut aujourd'hui",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Signaler les écarts sans corriger (code de sortie non nul si écart)",
+        )
+
+    def handle(self, *args, **options):
+        since = options["since"] or self.first_day()
+        until = options["until"] or timezone.localdate()
+        if since > until:
+            raise CommandError("La date de début doit précéder la date de fin.")
+        # Jours entiers : les périodes horaires et journalières coïncident
+        start, end = day_bounds(since, until)
+
+        with transaction.atomic():
+            # Verrouille les agrégats existants pour ne pas perdre de variation
+            # concurrente (les périodes créées entre-temps sont traitées plus
+            # bas par l'upsert)
+            stored = {
+                (granularity, bucket, status): (count, amount)
+                for granularity, bucket, status, count, amount in (
+                    PaymentRollup.objects.select_for_update()
+                    .filter(bucket__gte=start, bucket__lt=end)
+                    .values_list("granularity", "bucket", "status", "count", "amount")
+                )
+            }
+            actual = self.aggregate(start, end)
+
+            drift = {
+                key: (stored.get(key, (0, 0)), actual.get(key, (0, 0)))
+                for key in stored.keys() | actual.keys()
+                if stored.get(key, (0, 0)) != actual.get(key, (0, 0))
+            }
+            for (granularity, bucket, status), (expected, found) in sorted(
+                drift.items()
+            ):
+                self.stdout.write(
+                    f"{granularity} {timezone.localtime(bucket):%Y-%m-%d %H:%M} "
+                    f"{status}: agrégat={expected[0]} / {expected[1]} F, "
+                    f"réel={found[0]} / {found[1]} F"
+                )
+
+            if options["check"]:
+                if drift:
+                    raise CommandError(f"{len(drift)} agrégat(s) en écart")
+                self.stdout.write(self.style.SUCCESS("Aucun écart"))
+                return
+
+            # Écriture clé par clé (upsert), sans supprimer de ligne : un
+            # agrégat créé entre-temps par PaymentRollup.adjust est mis à jour
+            # au lieu de provoquer un conflit sur la contrainte unique
+            PaymentRollup.objects.bulk_create(
+                (
+                    PaymentRollup(
+                        granularity=granularity,
+                        bucket=bucket,
+                        status=status,
+                        count=count,
+                        amount=amount,
+                    )
+                    for (granularity, bucket, status), (_, (count, amount)) in (
+                        drift.items()
+                    )
+                ),
+                update_conflicts=True,
+                unique_fields=["granularity", "bucket", "status"],
+                update_fields=["count", "amount"],
+                batch_size=2000,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Agrégats du {since} au {until} reconstruits "
+                f"({len(drift)} écart(s) corrigé(s))"
+            )
+        )
+
+    def first_day(self):
+        first = Payment.objects.order_by("created_at").values_list(
+            "created_at", flat=True
+        )[:1]
+        return timezone.localdate(first[0]) if first else timezone.localdate()
+
+    def aggregate(self, start, end):
+        """{(granularité, période, statut): (nombre, montant)} sur [start, end)"""
+        payments = Payment.objects.order_by().filter(
+            created_at__gte=start, created_at__lt=end
+        )
+        actual = {}
+        for granularity, trunc in TRUNCATIONS.items():
+            rows = (
+                payments.annotate(bucket=trunc("created_at"))
+                .values("bucket", "status")
+                .annotate(count=Count("id"), amount=Sum("amount"))
+                .values_list("bucket", "status", "count", "amount")
+            )
+            for bucket, status, count, amount in rows:
+                actual[(granularity, bucket, status)] = (count, amount)
+        return actual
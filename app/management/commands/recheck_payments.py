@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Payment
+from app.recheck import recheck_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Revérifie auprès d'Arzeka le statut de paiements choisis (références "
+        "ou statut), en parallèle, et applique les résultats en une fois"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("references", nargs="*", help="Références eT… à vérifier")
+        parser.add_argument(
+            "--status",
+            choices=[status for status, _ in Payment.STATUS_CHOICES],
+            help="Vérifier tous les paiements ayant ce statut",
+        )
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=300,
+            help="Durée maximale (secondes) ; les vérifications restantes sont abandonnées",
+        )
+
+    def handle(self, *args, **options):
+        if not options["references"] and not options["status"]:
+            raise CommandError("Indiquez des références ou --status")
+
+        queryset = Payment.objects.only("id", "reference", "status", "updated_at")
+        if options["references"]:
+            queryset = queryset.filter(reference__in=options["references"])
+        if options["status"]:
+            queryset = queryset.filter(status=options["status"])
+
+        rows, elapsed = recheck_payments(
+            queryset.order_by("id"), options["workers"], options["timeout"]
+        )
+        for row in rows:
+            outcome = row["error"] or f"{row['previous']} -> {row['status']}"
+            self.stdout.write(f"{row['payment'].reference}: {outcome}")
+
+        checked = sum(1 for row in rows if not row["error"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{checked}/{len(rows)} paiement(s) vérifié(s) en {elapsed:.1f} s"
+            )
+        )
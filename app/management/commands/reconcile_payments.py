@@ -0,0 +1,150 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from app.gateway import check_payment
+from app.models import Payment
+
+FINAL_STATUSES = ("completed", "failed")
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie en continu auprès d'Arzeka le statut des paiements restés "
+        "en attente ou en cours de traitement"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=300,
+            help="Âge minimal (secondes) d'un paiement avant sa première vérification",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Nombre maximal d'appels simultanés à la passerelle",
+        )
+        parser.add_argument(
+            "--base-delay",
+            type=int,
+            default=60,
+            help="Délai (secondes) avant la deuxième vérification, doublé ensuite",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=int,
+            default=6 * 3600,
+            help="Délai maximal (secondes) entre deux vérifications d'un paiement",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=30,
+            help="Pause (secondes) entre deux passes quand rien n'est à vérifier",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Effectuer une seule passe puis quitter"
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        # Un seul pool pour toute la durée de la commande
+        self.executor = ThreadPoolExecutor(
+            max_workers=options["workers"], thread_name_prefix="reconcile"
+        )
+        try:
+            while True:
+                checked = self.sweep()
+                if options["once"]:
+                    break
+                if not checked:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé")
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+
+    def due_payments(self, now, after_id):
+        """Paiements ouverts dont la prochaine vérification est échue"""
+        stale_before = now - timedelta(seconds=self.options["stale_after"])
+        return (
+            Payment.objects.filter(
+                status__in=Payment.OPEN_STATUSES,
+                created_at__lte=stale_before,
+                id__gt=after_id,
+            )
+            .filter(Q(next_check_at__isnull=True) | Q(next_check_at__lte=now))
+            .order_by("id")
+            .only("id", "reference", "status", "check_attempts", "updated_at")
+        )
+
+    def sweep(self):
+        """Parcourt une fois l'ensemble des paiements à vérifier, lot par lot"""
+        now = timezone.now()
+        last_id, checked, finalized = 0, 0, 0
+
+        while True:
+            batch = list(self.due_payments(now, last_id)[: self.options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            results = self.executor.map(self.fetch_status, batch)
+            finalized += self.apply_results(list(zip(batch, results)))
+            checked += len(batch)
+
+        if checked:
+            self.stdout.write(
+                f"{checked} paiement(s) vérifié(s), {finalized} finalisé(s)"
+            )
+        return checked
+
+    def fetch_status(self, payment):
+        try:
+            return check_payment(payment.reference)
+        except Exception as e:
+            self.stderr.write(f"{payment.reference}: {e}")
+            return None
+        finally:
+            # Connexion ouverte par l'authentification et le cache en base,
+            # propre à ce thread du pool
+            connection.close()
+
+    def next_delay(self, attempts):
+        """Backoff exponentiel avec gigue pour éviter les vagues synchronisées"""
+        delay = min(self.options["max_delay"], self.options["base_delay"] * 2**attempts)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def apply_results(self, results):
+        """
+        Écrit les résultats d'un lot en requêtes groupées
+
+        Les changements de statut passent par les transitions conditionnelles
+        de Payment : une notification traitée entre-temps n'est pas écrasée.
+        """
+        now = timezone.now()
+        responses = [(payment, data) for payment, data in results if data is not None]
+        finalized = 0
+
+        statuses = Payment.apply_gateway_responses(responses, source="reconcile")
+        for payment, _ in results:
+            if statuses.get(payment.pk, payment.status) in FINAL_STATUSES:
+                payment.next_check_at = None
+                finalized += 1
+            else:
+                payment.next_check_at = now + self.next_delay(payment.check_attempts)
+            payment.check_attempts += 1
+        Payment.objects.bulk_update(
+            [payment for payment, _ in results], ["check_attempts", "next_check_at"]
+        )
+        return finalized
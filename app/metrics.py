@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import os
+import time
+
+import requests
+from fasoarzeka.exceptions import ArzekaAPIError
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Avec plusieurs workers (gunicorn, uvicorn), définir PROMETHEUS_MULTIPROC_DIR :
+# chaque processus écrit alors ses mesures dans des fichiers mmap agrégés par
+# la vue /metrics, au lieu de ne voir que celles du worker qui répond.
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Durée de traitement des requêtes HTTP",
+    ["route", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requêtes HTTP en cours de traitement",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+GATEWAY_LATENCY = Histogram(
+    "arzeka_gateway_duration_seconds",
+    "Durée des appels à la passerelle Arzeka",
+    ["operation", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+GATEWAY_ERRORS = Counter(
+    "arzeka_gateway_errors_total",
+    "Erreurs des appels à la passerelle Arzeka, par cause (timeout, connection, "
+    "http_5xx, busy, unavailable…)",
+    ["operation", "error"],
+)
+# Compteurs propres au processus (agrégés avec PROMETHEUS_MULTIPROC_DIR) :
+# aucune écriture dans le cache partagé à chaque affichage d'une page
+FRAGMENT_READS = Counter(
+    "payment_fragment_cache",
+    "Lectures du cache des fragments de détail",
+    ["result"],
+)
+for result in ("hits", "misses"):
+    FRAGMENT_READS.labels(result)
+GATEWAY_RETRIES = Counter(
+    "arzeka_gateway_retries_total",
+    "Nouvelles tentatives d'appel à la passerelle Arzeka (retried) ou refusées "
+    "faute de budget (budget_exhausted)",
+    ["operation", "result"],
+)
+
+
+def timed_gateway_call(operation):
+    """Décorateur mesurant durée, issue et erreurs d'un appel à la passerelle"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "success"
+                return result
+            except Exception as e:
+                record_gateway_error(operation, e)
+                raise
+            finally:
+                GATEWAY_LATENCY.labels(operation, outcome).observe(
+                    time.perf_counter() - start
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def gateway_error_label(error):
+    """
+    Cause d'une erreur de la passerelle
+
+    fasoarzeka enveloppe les exceptions de requests dans ArzekaConnectionError :
+    la cause d'origine (__cause__) distingue délai dépassé et connexion refusée.
+    """
+    from app.resilience import GatewayBusyError, GatewayUnavailableError
+
+    cause = error.__cause__
+    if isinstance(error, asyncio.TimeoutError) or isinstance(cause, requests.Timeout):
+        return "timeout"
+    if isinstance(cause, requests.ConnectionError):
+        return "connection"
+    if isinstance(error, GatewayBusyError):
+        return "busy"
+    if isinstance(error, GatewayUnavailableError):
+        return "unavailable"
+    if isinstance(error, ArzekaAPIError):
+        status = error.status_code
+        return f"http_{status // 100}xx" if status else "api"
+    return type(error).__name__
+
+
+def record_gateway_error(operation, error):
+    GATEWAY_ERRORS.labels(operation, gateway_error_label(error)).inc()
+
+
+class CacheStatsCollector:
+    """
+    Expose les compteurs et états partagés via le cache (vérifications,
+    disjoncteur de la passerelle)
+    """
+
+    def collect(self):
+        from app.gateway import check_stats, gateway_breaker
+
+        checks = CounterMetricFamily(
+            "arzeka_check_payment_calls",
+            "Vérifications de statut : appels réels, servis par le cache ou regroupés",
+            labels=["result"],
+        )
+        for result, value in check_stats().items():
+            checks.add_metric([result], value)
+        yield checks
+
+        breaker = GaugeMetricFamily(
+            "arzeka_circuit_breaker_state",
+            "État du disjoncteur de la passerelle Arzeka (1 pour l'état courant)",
+            labels=["state"],
+        )
+        current = gateway_breaker.state
+        for state in (
+            gateway_breaker.CLOSED,
+            gateway_breaker.HALF_OPEN,
+            gateway_breaker.OPEN,
+        ):
+            breaker.add_metric([state], int(state == current))
+        yield breaker
+
+
+_cache_registry = CollectorRegistry()
+_cache_registry.register(CacheStatsCollector())
+
+
+def metrics_registry():
+    """Mesures du processus, ou de tous les workers en mode multiprocessus"""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return registry
+
+
+def counter_values(name, results):
+    """Valeurs d'un compteur à un label `result`, par résultat"""
+    registry = metrics_registry()
+    return {
+        result: int(registry.get_sample_value(f"{name}_total", {"result": result}) or 0)
+        for result in results
+    }
+
+
+def render_metrics():
+    """Texte au format Prometheus et type de contenu correspondant"""
+    registry = metrics_registry()
+    return (
+        generate_latest(registry) + generate_latest(_cache_registry),
+        CONTENT_TYPE_LATEST,
+    )
@@ -0,0 +1,55 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from app.metrics import REQUEST_LATENCY, REQUESTS_IN_PROGRESS
+
+
+class MetricsMiddleware:
+    """
+    Mesure la durée, le code de retour et le nombre de requêtes en cours
+
+    La durée est étiquetée par motif d'URL (ex. payments/<int:payment_id>/)
+    et non par chemin, pour garder un nombre de séries borné. Compatible
+    WSGI et ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        in_progress = REQUESTS_IN_PROGRESS.labels(request.method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            in_progress.dec()
+        self.observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        in_progress = REQUESTS_IN_PROGRESS.labels(request.method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            in_progress.dec()
+        self.observe(request, response, start)
+        return response
+
+    @staticmethod
+    def observe(request, response, start):
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match else "<unmatched>"
+        REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - start
+        )
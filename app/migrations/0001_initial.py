@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Payment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lastname", models.CharField(max_length=100, verbose_name="Nom")),
+                ("firstname", models.CharField(max_length=100, verbose_name="Prénom")),
+                (
+                    "phone",
+                    models.CharField(max_length=20, verbose_name="Numéro de téléphone"),
+                ),
+                ("amount", models.IntegerField(verbose_name="Montant (Francs CFA)")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours de traitement"),
+                            ("completed", "Terminé"),
+                            ("failed", "Échoué"),
+                            ("cancelled", "Annulé"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de création"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Date de modification"
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True,
+                        max_length=100,
+                        unique=True,
+                        verbose_name="Référence de paiement",
+                    ),
+                ),
+                (
+                    "transaction_id",
+                    models.CharField(
+                        max_length=100,
+                        null=True,
+                        unique=True,
+                        verbose_name="ID de transaction",
+                    ),
+                ),
+                ("request_data", models.JSONField(blank=True, null=True)),
+                ("final_response", models.JSONField(blank=True, null=True)),
+                ("intermediary_response", models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Paiement",
+                "verbose_name_plural": "Paiements",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
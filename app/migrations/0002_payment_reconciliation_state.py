@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="check_attempts",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Vérifications effectuées"
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="next_check_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Prochaine vérification"
+            ),
+        ),
+    ]
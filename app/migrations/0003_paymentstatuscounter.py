@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Payment = apps.get_model("app", "Payment")
+    PaymentStatusCounter = apps.get_model("app", "PaymentStatusCounter")
+    PaymentStatusCounter.objects.bulk_create(
+        PaymentStatusCounter(status=row["status"], count=row["count"])
+        for row in Payment.objects.values("status").annotate(count=Count("id"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0002_payment_reconciliation_state"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentStatusCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours de traitement"),
+                            ("completed", "Terminé"),
+                            ("failed", "Échoué"),
+                            ("cancelled", "Annulé"),
+                        ],
+                        max_length=20,
+                        unique=True,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "count",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Nombre de paiements"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Compteur de paiements",
+                "verbose_name_plural": "Compteurs de paiements",
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0004_payment_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("initiate", "Initialisation"),
+                            ("check", "Vérification"),
+                            ("webhook", "Notification Arzeka"),
+                            ("reconcile", "Réconciliation"),
+                        ],
+                        max_length=20,
+                        verbose_name="Origine",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours de traitement"),
+                            ("completed", "Terminé"),
+                            ("failed", "Échoué"),
+                            ("cancelled", "Annulé"),
+                        ],
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "payload",
+                    models.JSONField(blank=True, null=True, verbose_name="Réponse"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Date"),
+                ),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="app.payment",
+                        verbose_name="Paiement",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Événement de paiement",
+                "verbose_name_plural": "Événements de paiement",
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["payment", "-created_at"],
+                        name="paymentevent_payment_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+from web.utils import convert_arzeka_payment_status
+
+
+def explode_intermediary_response(apps, schema_editor):
+    """
+    Transforme les listes de réponses intermédiaires en PaymentEvent
+
+    Le premier élément (réponse d'initialisation) reste dans
+    intermediary_response ; la réponse finale devient aussi un événement.
+
+    Les réponses Arzeka ne sont pas datées : les événements d'un paiement
+    reçoivent tous la date de sa dernière modification. Leur ordre n'est
+    conservé que par l'id (créés dans l'ordre de la liste), que la
+    chronologie utilise pour départager les dates égales.
+    """
+    Payment = apps.get_model("app", "Payment")
+    PaymentEvent = apps.get_model("app", "PaymentEvent")
+
+    events, shrunk = [], []
+    payments = Payment.objects.exclude(
+        intermediary_response__isnull=True, final_response__isnull=True
+    ).only("id", "updated_at", "intermediary_response", "final_response")
+
+    for payment in payments.iterator(chunk_size=500):
+        responses = payment.intermediary_response
+        if isinstance(responses, dict):
+            responses = [responses]
+        elif not isinstance(responses, list):
+            responses = []
+
+        for index, payload in enumerate(responses):
+            # Un élément qui n'est pas un objet JSON n'a pas de statut lisible
+            status = (
+                payload.get("status", "PENDING")
+                if isinstance(payload, dict)
+                else "PENDING"
+            )
+            events.append(
+                PaymentEvent(
+                    payment_id=payment.id,
+                    source="initiate" if index == 0 else "check",
+                    status=convert_arzeka_payment_status(status),
+                    payload=payload,
+                )
+            )
+        if payment.final_response:
+            events.append(
+                PaymentEvent(
+                    payment_id=payment.id,
+                    source="check",
+                    status="completed",
+                    payload=payment.final_response,
+                )
+            )
+
+        if len(responses) > 1:
+            payment.intermediary_response = responses[0]
+            shrunk.append(payment)
+
+        if len(events) >= 1000:
+            PaymentEvent.objects.bulk_create(events)
+            events = []
+        if len(shrunk) >= 500:
+            Payment.objects.bulk_update(shrunk, ["intermediary_response"])
+            shrunk = []
+
+    PaymentEvent.objects.bulk_create(events)
+    Payment.objects.bulk_update(shrunk, ["intermediary_response"])
+
+    # Les dates réelles des réponses sont inconnues : on reprend la date de
+    # dernière modification du paiement (l'ordre entre les événements d'un
+    # même paiement n'est pas daté, seulement porté par l'id)
+    PaymentEvent.objects.update(
+        created_at=Subquery(
+            Payment.objects.filter(pk=OuterRef("payment_id")).values("updated_at")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_paymentevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(explode_intermediary_response, migrations.RunPython.noop),
+    ]
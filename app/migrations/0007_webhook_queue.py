@@ -0,0 +1,132 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0006_explode_intermediary_response"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WebhookJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        max_length=100, verbose_name="Référence de paiement"
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="Notification")),
+                (
+                    "payload_hash",
+                    models.CharField(
+                        max_length=64,
+                        unique=True,
+                        verbose_name="Empreinte de la notification",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours de traitement"),
+                            ("done", "Traitée"),
+                            ("dead", "Abandonnée"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Tentatives"),
+                ),
+                (
+                    "available_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Prochaine tentative",
+                    ),
+                ),
+                ("claimed_by", models.CharField(blank=True, default="", max_length=32)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "last_error",
+                    models.TextField(blank=True, default="", verbose_name="Erreur"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de réception"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification Arzeka",
+                "verbose_name_plural": "Notifications Arzeka",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "available_at"], name="webhookjob_queue_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="WebhookDeadLetter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        max_length=100, verbose_name="Référence de paiement"
+                    ),
+                ),
+                ("payload", models.JSONField(verbose_name="Notification")),
+                ("attempts", models.PositiveIntegerField(verbose_name="Tentatives")),
+                ("error", models.TextField(verbose_name="Dernière erreur")),
+                (
+                    "failed_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date d'abandon"
+                    ),
+                ),
+                (
+                    "job",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dead_letter",
+                        to="app.webhookjob",
+                        verbose_name="Notification",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification abandonnée",
+                "verbose_name_plural": "Notifications abandonnées",
+            },
+        ),
+    ]
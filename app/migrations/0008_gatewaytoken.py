@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0007_webhook_queue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GatewayToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("access_token", models.TextField(blank=True, default="")),
+                ("token_type", models.CharField(default="Bearer", max_length=20)),
+                ("expires_at", models.DateTimeField(blank=True, null=True)),
+                ("refreshing_until", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Jeton Arzeka",
+                "verbose_name_plural": "Jetons Arzeka",
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:40
+
+import app.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+PAYLOAD_FIELDS = ("request_data", "final_response", "intermediary_response")
+
+
+def move_payloads(apps, schema_editor):
+    """Copie les réponses JSON de Payment vers PaymentPayload (compressées)"""
+    Payment = apps.get_model("app", "Payment")
+    PaymentPayload = apps.get_model("app", "PaymentPayload")
+
+    payments = Payment.objects.exclude(
+        request_data__isnull=True,
+        final_response__isnull=True,
+        intermediary_response__isnull=True,
+    ).values("id", *PAYLOAD_FIELDS)
+    batch = []
+    for row in payments.iterator(chunk_size=500):
+        batch.append(PaymentPayload(payment_id=row.pop("id"), **row))
+        if len(batch) >= 500:
+            PaymentPayload.objects.bulk_create(batch)
+            batch = []
+    PaymentPayload.objects.bulk_create(batch)
+
+
+def restore_payloads(apps, schema_editor):
+    Payment = apps.get_model("app", "Payment")
+    PaymentPayload = apps.get_model("app", "PaymentPayload")
+
+    batch = []
+    for payload in PaymentPayload.objects.iterator(chunk_size=500):
+        batch.append(
+            Payment(
+                id=payload.payment_id,
+                **{name: getattr(payload, name) for name in PAYLOAD_FIELDS},
+            )
+        )
+        if len(batch) >= 500:
+            Payment.objects.bulk_update(batch, PAYLOAD_FIELDS)
+            batch = []
+    Payment.objects.bulk_update(batch, PAYLOAD_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0008_gatewaytoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentPayload",
+            fields=[
+                (
+                    "payment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="payload",
+                        serialize=False,
+                        to="app.payment",
+                        verbose_name="Paiement",
+                    ),
+                ),
+                ("request_data", app.fields.CompressedJSONField(blank=True, null=True)),
+                (
+                    "final_response",
+                    app.fields.CompressedJSONField(blank=True, null=True),
+                ),
+                (
+                    "intermediary_response",
+                    app.fields.CompressedJSONField(blank=True, null=True),
+                ),
+            ],
+            options={
+                "verbose_name": "Réponses de la passerelle",
+                "verbose_name_plural": "Réponses de la passerelle",
+            },
+        ),
+        migrations.RunPython(move_payloads, restore_payloads),
+        migrations.RemoveField(
+            model_name="payment",
+            name="final_response",
+        ),
+        migrations.RemoveField(
+            model_name="payment",
+            name="intermediary_response",
+        ),
+        migrations.RemoveField(
+            model_name="payment",
+            name="request_data",
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0009_payment_payload"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="paymentevent",
+            name="source",
+            field=models.CharField(
+                choices=[
+                    ("initiate", "Initialisation"),
+                    ("check", "Vérification"),
+                    ("webhook", "Notification Arzeka"),
+                    ("reconcile", "Réconciliation"),
+                    ("settlement", "Relevé de règlement"),
+                ],
+                max_length=20,
+                verbose_name="Origine",
+            ),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from app.search import tokenize
+
+
+def index_payments(apps, schema_editor):
+    """Indexe le nom et le prénom des paiements existants"""
+    Payment = apps.get_model("app", "Payment")
+    PaymentSearchToken = apps.get_model("app", "PaymentSearchToken")
+
+    tokens = []
+    payments = Payment.objects.values_list("id", "lastname", "firstname")
+    for payment_id, lastname, firstname in payments.iterator(chunk_size=2000):
+        tokens.extend(
+            PaymentSearchToken(payment_id=payment_id, token=token[:100])
+            for token in tokenize(lastname, firstname)
+        )
+        if len(tokens) >= 5000:
+            PaymentSearchToken.objects.bulk_create(tokens)
+            tokens = []
+    PaymentSearchToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0010_paymentevent_settlement_source"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=100, verbose_name="Mot")),
+            ],
+            options={
+                "verbose_name": "Mot indexé",
+                "verbose_name_plural": "Mots indexés",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["phone"], name="payment_phone_idx"),
+        ),
+        migrations.AddField(
+            model_name="paymentsearchtoken",
+            name="payment",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="search_tokens",
+                to="app.payment",
+                verbose_name="Paiement",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentsearchtoken",
+            index=models.Index(
+                fields=["token", "payment"], name="paymentsearch_token_idx"
+            ),
+        ),
+        migrations.RunPython(index_payments, migrations.RunPython.noop),
+    ]
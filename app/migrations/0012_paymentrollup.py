@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+
+def populate_rollups(apps, schema_editor):
+    """Agrège les paiements existants par heure et par jour"""
+    Payment = apps.get_model("app", "Payment")
+    PaymentRollup = apps.get_model("app", "PaymentRollup")
+    for granularity, trunc in (("hour", TruncHour), ("day", TruncDay)):
+        rows = (
+            Payment.objects.order_by()
+            .annotate(bucket=trunc("created_at"))
+            .values("bucket", "status")
+            .annotate(count=Count("id"), amount=Sum("amount"))
+        )
+        PaymentRollup.objects.bulk_create(
+            (PaymentRollup(granularity=granularity, **row) for row in rows),
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0011_payment_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Heure"), ("day", "Jour")],
+                        max_length=4,
+                        verbose_name="Granularité",
+                    ),
+                ),
+                ("bucket", models.DateTimeField(verbose_name="Début de la période")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours de traitement"),
+                            ("completed", "Terminé"),
+                            ("failed", "Échoué"),
+                            ("cancelled", "Annulé"),
+                        ],
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "count",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Nombre de paiements"
+                    ),
+                ),
+                (
+                    "amount",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Montant total (Francs CFA)"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Agrégat de paiements",
+                "verbose_name_plural": "Agrégats de paiements",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("granularity", "bucket", "status"),
+                        name="paymentrollup_bucket_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+def seed_counters(apps, schema_editor):
+    """Crée un compteur à zéro pour chaque statut qui n'en a pas encore"""
+    PaymentStatusCounter = apps.get_model("app", "PaymentStatusCounter")
+    for status, _ in PaymentStatusCounter._meta.get_field("status").choices:
+        PaymentStatusCounter.objects.get_or_create(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0012_paymentrollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
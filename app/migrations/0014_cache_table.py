@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:20
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    """Crée les tables des caches en base (CACHE_URL=dbcache://...)"""
+    call_command("createcachetable", database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0013_seed_status_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
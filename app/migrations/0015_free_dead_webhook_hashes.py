@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:10
+
+from django.db import migrations
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def free_dead_hashes(apps, schema_editor):
+    """Libère l'empreinte des notifications abandonnées (dead:<id>)"""
+    WebhookJob = apps.get_model("app", "WebhookJob")
+    WebhookJob.objects.filter(status="dead").exclude(
+        payload_hash__startswith="dead:"
+    ).update(
+        payload_hash=Concat(
+            Value("dead:"), Cast("id", CharField()), output_field=CharField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0014_cache_table"),
+    ]
+
+    operations = [
+        migrations.RunPython(free_dead_hashes, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,27 @@
+import hashlib
+import json
+from collections import defaultdict
+from datetime import timedelta
 from decimal import Decimal
 
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.cache import invalidate_fragments
+from app.fields import CompressedJSONField
+from app.search import (
+    PHONE_RE,
+    REFERENCE_RE,
+    normalize_phone,
+    normalize_reference,
+    prefix_range,
+    tokenize,
+)
+from web.utils import convert_arzeka_payment_status
+
+PAYLOAD_FIELDS = ("request_data", "final_response", "intermediary_response")
 
 
 class Payment(models.Model):
@@ -15,6 +35,9 @@ class Payment(models.Model):
         message="Le numéro de téléphone doit être au format: +226 XX XX XX XX",
     )
 
+    # Statuts pour lesquels le paiement n'est pas encore finalisé
+    OPEN_STATUSES = ["pending", "processing"]
+
     # Choix pour le statut du paiement
     STATUS_CHOICES = [
         ("pending", "En attente"),
@@ -24,6 +47,16 @@ class Payment(models.Model):
         ("cancelled", "Annulé"),
     ]
 
+    # Transitions de statut autorisées : un paiement terminé ne revient jamais
+    # en arrière. Un paiement échoué peut encore être confirmé tardivement.
+    ALLOWED_TRANSITIONS = {
+        "pending": {"processing", "completed", "failed", "cancelled"},
+        "processing": {"completed", "failed", "cancelled"},
+        "failed": {"completed"},
+        "completed": set(),
+        "cancelled": set(),
+    }
+
     lastname = models.CharField(max_length=100, verbose_name="Nom")
     firstname = models.CharField(max_length=100, verbose_name="Prénom")
     phone = models.CharField(max_length=20, verbose_name="Numéro de téléphone")
@@ -43,19 +76,355 @@ class Payment(models.Model):
     transaction_id = models.CharField(
         max_length=100, unique=True, null=True, verbose_name="ID de transaction"
     )
-    
-    request_data = models.JSONField(null=True, blank=True)
-    final_response = models.JSONField(null=True, blank=True)
-    intermediary_response = models.JSONField(null=True, blank=True)
+
+    # Suivi de la réconciliation (commande reconcile_payments)
+    check_attempts = models.PositiveIntegerField(
+        default=0, verbose_name="Vérifications effectuées"
+    )
+    next_check_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Prochaine vérification"
+    )
 
     class Meta:
         verbose_name = "Paiement"
         verbose_name_plural = "Paiements"
         ordering = ["-created_at"]
+        indexes = [
+            # Liste paginée par curseur (created_at, id)
+            models.Index(fields=["-created_at", "-id"], name="payment_created_idx"),
+            # Filtre par statut de l'admin, trié par date
+            models.Index(
+                fields=["status", "-created_at"], name="payment_status_created_idx"
+            ),
+            # Recherche de l'admin par numéro de téléphone
+            models.Index(fields=["phone"], name="payment_phone_idx"),
+            # Paiements ouverts à réconcilier (index partiel, peu de lignes)
+            models.Index(
+                fields=["id"],
+                condition=Q(status__in=["pending", "processing"]),
+                name="payment_open_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.firstname} {self.lastname} - {self.amount} Francs CFA"
 
+    def _get_payload(self, name):
+        try:
+            return getattr(self.payload, name)
+        except PaymentPayload.DoesNotExist:
+            return None
+
+    # Réponses de la passerelle, stockées compressées dans PaymentPayload
+    request_data = property(lambda self: self._get_payload("request_data"))
+    final_response = property(lambda self: self._get_payload("final_response"))
+    intermediary_response = property(
+        lambda self: self._get_payload("intermediary_response")
+    )
+
+    def store_payloads(self, **payloads):
+        """Enregistre des réponses de la passerelle (request_data, ...) compressées"""
+        self.payload, _ = PaymentPayload.objects.update_or_create(
+            payment=self, defaults=payloads
+        )
+        invalidate_fragments("payment-detail", self.pk)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut et montant tels que lus en base, pour détecter les
+        # changements au save()
+        instance._loaded_status = instance.__dict__.get("status")
+        instance._loaded_amount = instance.__dict__.get("amount")
+        return instance
+
+    def _rollup_fields(self):
+        """(created_at, amount), relus en une requête s'ils sont différés"""
+        if {"created_at", "amount"} & self.get_deferred_fields():
+            self.refresh_from_db(fields=["created_at", "amount"])
+        return self.created_at, self.amount
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        adding = self._state.adding
+        previous = getattr(self, "_loaded_status", None)
+        previous_amount = getattr(self, "_loaded_amount", None)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            status_changed = (
+                not adding
+                and previous
+                and previous != self.status
+                and (update_fields is None or "status" in update_fields)
+            )
+            amount_changed = (
+                not adding
+                and previous_amount is not None
+                and previous_amount != self.amount
+                and (update_fields is None or "amount" in update_fields)
+            )
+            if adding:
+                PaymentStatusCounter.adjust({self.status: 1})
+                PaymentRollup.adjust([(self.created_at, self.status, 1, self.amount)])
+            elif status_changed or amount_changed:
+                if status_changed:
+                    PaymentStatusCounter.adjust({previous: -1, self.status: 1})
+                created_at, amount = self._rollup_fields()
+                PaymentRollup.adjust(
+                    [
+                        (
+                            created_at,
+                            previous if status_changed else self.status,
+                            -1,
+                            -(previous_amount if amount_changed else amount),
+                        ),
+                        (created_at, self.status, 1, amount),
+                    ]
+                )
+            if (
+                adding
+                or update_fields is None
+                or {"lastname", "firstname"} & set(update_fields)
+            ):
+                PaymentSearchToken.index(self)
+            invalidate_fragments("payment-detail", self.pk)
+        self._loaded_status = self.status
+        self._loaded_amount = self.__dict__.get("amount")
+
+    def transition_to(self, status, **fields):
+        """
+        Change le statut du paiement si la transition est autorisée
+
+        La mise à jour est un compare-and-set (UPDATE ... WHERE status = <statut
+        lu>) qui n'écrit que le statut et les champs fournis. En cas de
+        modification concurrente, le statut est relu et la transition
+        réévaluée : aucune écriture n'est perdue ni ne fait reculer le statut.
+
+        Returns:
+            bool: True si le statut a été modifié
+        """
+        now = timezone.now()
+        payloads = {name: fields.pop(name) for name in PAYLOAD_FIELDS if name in fields}
+        while status != self.status and status in self.ALLOWED_TRANSITIONS.get(
+            self.status, ()
+        ):
+            previous = self.status
+            with transaction.atomic():
+                updated = Payment.objects.filter(pk=self.pk, status=previous).update(
+                    status=status, updated_at=now, **fields
+                )
+                if updated:
+                    PaymentStatusCounter.adjust({previous: -1, status: 1})
+                    created_at, amount = self._rollup_fields()
+                    PaymentRollup.adjust(
+                        [
+                            (created_at, previous, -1, -amount),
+                            (created_at, status, 1, amount),
+                        ]
+                    )
+                    if payloads:
+                        self.store_payloads(**payloads)
+            if updated:
+                for name, value in fields.items():
+                    setattr(self, name, value)
+                self.status = self._loaded_status = status
+                self.updated_at = now
+                return True
+            self.status = self._loaded_status = Payment.objects.values_list(
+                "status", flat=True
+            ).get(pk=self.pk)
+        return False
+
+    @classmethod
+    def bulk_transition(cls, ids, previous, status):
+        """
+        Applique une même transition à plusieurs paiements en une requête
+
+        Seuls les paiements encore au statut `previous` sont modifiés, sans
+        verrouillage préalable. Les lignes modifiées (repérées par le
+        updated_at qui vient de leur être attribué) sont ensuite relues dans
+        la même transaction, où la mise à jour les protège déjà, pour tenir à
+        jour les agrégats PaymentRollup.
+
+        Returns:
+            list: identifiants des paiements modifiés
+        """
+        if status not in cls.ALLOWED_TRANSITIONS.get(previous, ()):
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            updated = cls.objects.filter(pk__in=ids, status=previous).update(
+                status=status, updated_at=now
+            )
+            if not updated:
+                return []
+            rows = list(
+                cls.objects.filter(
+                    pk__in=ids, status=status, updated_at=now
+                ).values_list("pk", "created_at", "amount")
+            )
+            PaymentStatusCounter.adjust({previous: -updated, status: updated})
+            PaymentRollup.adjust(
+                entry
+                for _, created_at, amount in rows
+                for entry in (
+                    (created_at, previous, -1, -amount),
+                    (created_at, status, 1, amount),
+                )
+            )
+        return [pk for pk, _, _ in rows]
+
+    def record_gateway_response(self, payment_data, source, only_changes=False):
+        """
+        Applique une réponse de la passerelle Arzeka au paiement
+
+        Le statut passe par transition_to et la réponse est ajoutée comme
+        PaymentEvent (une seule insertion) au lieu de réécrire l'historique
+        JSON complet. Avec `only_changes` (réponse déjà journalisée, reprise
+        d'un cache), l'événement n'est écrit que si le statut a changé.
+
+        Returns:
+            PaymentEvent: l'événement écrit, ou None
+        """
+        status = convert_arzeka_payment_status(payment_data.get("status", "pending"))
+        fields = {}
+        if status == "completed":
+            fields = {
+                "final_response": payment_data,
+                "transaction_id": payment_data.get("third_party_trans_id"),
+            }
+
+        with transaction.atomic():
+            changed = self.transition_to(status, **fields)
+            if only_changes and not changed:
+                return None
+            # Nouvel événement dans la chronologie, même sans changement de statut
+            invalidate_fragments("payment-detail", self.pk)
+            return PaymentEvent.objects.create(
+                payment=self, source=source, status=status, payload=payment_data
+            )
+
+    @classmethod
+    def apply_gateway_responses(cls, responses, source):
+        """
+        Version groupée de record_gateway_response pour un lot de paiements
+
+        `responses` est une liste de couples (paiement, réponse Arzeka). Les
+        transitions identiques sont appliquées en une requête et les
+        événements insérés en une fois ; seuls les paiements terminés, qui
+        portent des données propres (final_response, transaction_id), sont
+        écrits un par un.
+
+        Returns:
+            dict: statut Arzeka converti, par id de paiement
+        """
+        statuses, completed, events = {}, [], []
+        transitions = defaultdict(list)
+        for payment, payment_data in responses:
+            status = convert_arzeka_payment_status(
+                payment_data.get("status", "pending")
+            )
+            statuses[payment.pk] = status
+            if status == "completed":
+                completed.append((payment, payment_data))
+            elif status != payment.status:
+                transitions[(payment.status, status)].append(payment.pk)
+            events.append(
+                PaymentEvent(
+                    payment=payment, source=source, status=status, payload=payment_data
+                )
+            )
+
+        with transaction.atomic():
+            for (previous, status), ids in transitions.items():
+                cls.bulk_transition(ids, previous, status)
+            PaymentEvent.objects.bulk_create(events)
+            invalidate_fragments("payment-detail", *statuses)
+
+        for payment, payment_data in completed:
+            payment.transition_to(
+                "completed",
+                final_response=payment_data,
+                transaction_id=payment_data.get("third_party_trans_id"),
+            )
+        return statuses
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            created_at, amount = self._rollup_fields()
+            result = super().delete(*args, **kwargs)
+            PaymentStatusCounter.adjust({self.status: -1})
+            PaymentRollup.adjust([(created_at, self.status, -1, -amount)])
+        return result
+
+    @classmethod
+    def bulk_delete(cls, queryset):
+        """
+        Supprime les paiements de `queryset` en tenant à jour les compteurs
+
+        La suppression est faite statut par statut (DELETE ... WHERE status =
+        <statut lu>) : un paiement dont le statut a changé entre-temps est
+        conservé plutôt que décompté du mauvais compteur.
+
+        Returns:
+            int: nombre de paiements supprimés
+        """
+        rows = defaultdict(list)
+        for pk, status, created_at, amount in queryset.values_list(
+            "pk", "status", "created_at", "amount"
+        ):
+            rows[status].append((pk, created_at, amount))
+
+        deleted = 0
+        with transaction.atomic():
+            for status, payments in rows.items():
+                pks = [pk for pk, _, _ in payments]
+                _, per_model = cls.objects.filter(pk__in=pks, status=status).delete()
+                count = per_model.get(cls._meta.label, 0)
+                if count < len(pks):
+                    # Paiements conservés : leur statut a changé entre-temps
+                    kept = set(
+                        cls.objects.filter(pk__in=pks).values_list("pk", flat=True)
+                    )
+                    payments = [row for row in payments if row[0] not in kept]
+                deleted += count
+                PaymentStatusCounter.adjust({status: -count})
+                PaymentRollup.adjust(
+                    (created_at, status, -1, -amount)
+                    for _, created_at, amount in payments
+                )
+                invalidate_fragments("payment-detail", *pks)
+        return deleted
+
+    @classmethod
+    def search_filter(cls, term):
+        """
+        Filtre de recherche indexé (admin)
+
+        Une référence eT… est cherchée par préfixe, un numéro de téléphone
+        exactement s'il est complet et par préfixe sinon, sur l'index de leur
+        colonne. Sinon, chaque mot doit être le début d'un mot du nom ou du
+        prénom (table PaymentSearchToken).
+        """
+        term = term.strip()
+        if REFERENCE_RE.match(term):
+            return Q(**prefix_range("reference", normalize_reference(term)))
+        if PHONE_RE.match(term):
+            phone = normalize_phone(term)
+            if len(phone) == 11:
+                return Q(phone=phone)
+            return Q(**prefix_range("phone", phone))
+
+        condition = Q()
+        for token in tokenize(term):
+            condition &= Q(
+                pk__in=PaymentSearchToken.objects.filter(
+                    **prefix_range("token", token)
+                ).values("payment_id")
+            )
+        return condition
+
     @property
     def full_name(self):
         """Retourne le nom complet"""
@@ -65,3 +434,396 @@ class Payment(models.Model):
     def formatted_amount(self):
         """Retourne le montant formaté"""
         return f"{self.amount:,.0f} Francs CFA".replace(",", " ")
+
+
+class PaymentPayload(models.Model):
+    """
+    Réponses JSON de la passerelle pour un paiement, compressées
+
+    Séparées de Payment pour que les listes et l'admin ne lisent que des
+    colonnes scalaires ; elles ne sont chargées qu'à l'accès.
+    """
+
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="payload",
+        verbose_name="Paiement",
+    )
+    request_data = CompressedJSONField(null=True, blank=True)
+    final_response = CompressedJSONField(null=True, blank=True)
+    intermediary_response = CompressedJSONField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Réponses de la passerelle"
+        verbose_name_plural = "Réponses de la passerelle"
+
+    def __str__(self):
+        return f"Réponses du paiement {self.payment_id}"
+
+
+class PaymentSearchToken(models.Model):
+    """
+    Mots normalisés du nom et du prénom d'un paiement, pour la recherche
+
+    Remplace les LIKE '%terme%' de l'admin (parcours complets) par une
+    recherche par préfixe sur un index. Tenue à jour par Payment.save().
+    """
+
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="search_tokens",
+        verbose_name="Paiement",
+    )
+    token = models.CharField(max_length=100, verbose_name="Mot")
+
+    class Meta:
+        verbose_name = "Mot indexé"
+        verbose_name_plural = "Mots indexés"
+        indexes = [
+            models.Index(fields=["token", "payment"], name="paymentsearch_token_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.token} ({self.payment_id})"
+
+    @classmethod
+    def index(cls, payment):
+        """Remplace les mots indexés d'un paiement"""
+        cls.objects.filter(payment=payment).delete()
+        cls.objects.bulk_create(
+            cls(payment=payment, token=token[:100])
+            for token in tokenize(payment.lastname, payment.firstname)
+        )
+
+
+class PaymentStatusCounter(models.Model):
+    """
+    Nombre de paiements par statut, maintenu à chaque création ou changement
+    de statut d'un paiement
+
+    Les opérations de masse (QuerySet.update, bulk_create...) contournent ce
+    suivi : la commande rebuild_payment_counters recalcule les compteurs.
+    """
+
+    status = models.CharField(
+        max_length=20,
+        choices=Payment.STATUS_CHOICES,
+        unique=True,
+        verbose_name="Statut",
+    )
+    count = models.BigIntegerField(default=0, verbose_name="Nombre de paiements")
+
+    class Meta:
+        verbose_name = "Compteur de paiements"
+        verbose_name_plural = "Compteurs de paiements"
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+    @classmethod
+    def adjust(cls, deltas):
+        """Applique des variations {statut: delta} dans la transaction courante"""
+        with transaction.atomic():
+            for status, delta in deltas.items():
+                if not delta:
+                    continue
+                updated = cls.objects.filter(status=status).update(
+                    count=F("count") + delta
+                )
+                if updated:
+                    continue
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(status=status, count=delta)
+                except IntegrityError:
+                    # Compteur créé entre-temps par une autre transaction
+                    cls.objects.filter(status=status).update(count=F("count") + delta)
+
+    @classmethod
+    def get_counts(cls):
+        """Retourne {statut: nombre} pour tous les statuts ainsi que le total"""
+        counts = {status: 0 for status, _ in Payment.STATUS_CHOICES}
+        counts.update(cls.objects.values_list("status", "count"))
+        counts["total"] = sum(counts.values())
+        return counts
+
+
+class PaymentRollup(models.Model):
+    """
+    Nombre et montant total des paiements par heure ou par jour et par statut
+
+    Les agrégats sont maintenus en même temps que PaymentStatusCounter, dans
+    la transaction qui crée le paiement ou change son statut ; le tableau de
+    bord ne lit que cette table. Les paiements sont rangés selon leur date de
+    création, dans le fuseau horaire du site. Les opérations de masse
+    contournent ce suivi : la commande rebuild_payment_rollups recalcule une
+    période.
+    """
+
+    HOUR, DAY = "hour", "day"
+    GRANULARITY_CHOICES = [(HOUR, "Heure"), (DAY, "Jour")]
+
+    granularity = models.CharField(
+        max_length=4, choices=GRANULARITY_CHOICES, verbose_name="Granularité"
+    )
+    bucket = models.DateTimeField(verbose_name="Début de la période")
+    status = models.CharField(
+        max_length=20, choices=Payment.STATUS_CHOICES, verbose_name="Statut"
+    )
+    count = models.BigIntegerField(default=0, verbose_name="Nombre de paiements")
+    amount = models.BigIntegerField(
+        default=0, verbose_name="Montant total (Francs CFA)"
+    )
+
+    class Meta:
+        verbose_name = "Agrégat de paiements"
+        verbose_name_plural = "Agrégats de paiements"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "status"],
+                name="paymentrollup_bucket_uniq",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} {self.status}"
+
+    @classmethod
+    def buckets(cls, created_at):
+        """Début de l'heure et du jour (heure locale) contenant `created_at`"""
+        hour = timezone.localtime(created_at).replace(minute=0, second=0, microsecond=0)
+        return {cls.HOUR: hour, cls.DAY: hour.replace(hour=0)}
+
+    @classmethod
+    def adjust(cls, entries):
+        """
+        Applique des variations dans la transaction courante
+
+        `entries` contient des tuples (created_at, statut, nombre, montant) ;
+        les variations d'une même période sont regroupées en une requête.
+        """
+        deltas = defaultdict(lambda: [0, 0])
+        for created_at, status, count, amount in entries:
+            for granularity, bucket in cls.buckets(created_at).items():
+                delta = deltas[(granularity, bucket, status)]
+                delta[0] += count
+                delta[1] += amount
+
+        with transaction.atomic():
+            for (granularity, bucket, status), (count, amount) in deltas.items():
+                if not count and not amount:
+                    continue
+                rollup = cls.objects.filter(
+                    granularity=granularity, bucket=bucket, status=status
+                )
+                if rollup.update(count=F("count") + count, amount=F("amount") + amount):
+                    continue
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            granularity=granularity,
+                            bucket=bucket,
+                            status=status,
+                            count=count,
+                            amount=amount,
+                        )
+                except IntegrityError:
+                    # Période créée entre-temps par une autre transaction
+                    rollup.update(count=F("count") + count, amount=F("amount") + amount)
+
+    @classmethod
+    def get_series(cls, granularity, start, end):
+        """
+        Agrégats des périodes de [start, end), y compris les périodes vides
+
+        Returns:
+            list: un dict par période avec "bucket", "statuses" ({statut:
+            {"count", "amount"}}) et les totaux "count" et "amount"
+        """
+        step = timedelta(hours=1) if granularity == cls.HOUR else timedelta(days=1)
+        series, bucket = {}, cls.buckets(start)[granularity]
+        while bucket < end:
+            series[bucket] = {
+                "bucket": bucket,
+                "statuses": {
+                    status: {"count": 0, "amount": 0}
+                    for status, _ in Payment.STATUS_CHOICES
+                },
+                "count": 0,
+                "amount": 0,
+            }
+            bucket = timezone.localtime(bucket + step)
+
+        rows = cls.objects.filter(
+            granularity=granularity, bucket__gte=start, bucket__lt=end
+        ).values_list("bucket", "status", "count", "amount")
+        for bucket, status, count, amount in rows:
+            point = series.get(timezone.localtime(bucket))
+            if point is None:
+                continue
+            point["statuses"][status] = {"count": count, "amount": amount}
+            point["count"] += count
+            point["amount"] += amount
+        return list(series.values())
+
+
+class PaymentEvent(models.Model):
+    """
+    Historique des réponses de la passerelle pour un paiement
+
+    Table en ajout seul : chaque réponse (initialisation, vérification,
+    notification) est une ligne.
+    """
+
+    SOURCE_CHOICES = [
+        ("initiate", "Initialisation"),
+        ("check", "Vérification"),
+        ("webhook", "Notification Arzeka"),
+        ("reconcile", "Réconciliation"),
+        ("settlement", "Relevé de règlement"),
+    ]
+
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="events",
+        verbose_name="Paiement",
+    )
+    source = models.CharField(
+        max_length=20, choices=SOURCE_CHOICES, verbose_name="Origine"
+    )
+    status = models.CharField(
+        max_length=20, choices=Payment.STATUS_CHOICES, verbose_name="Statut"
+    )
+    payload = models.JSONField(null=True, blank=True, verbose_name="Réponse")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date")
+
+    class Meta:
+        verbose_name = "Événement de paiement"
+        verbose_name_plural = "Événements de paiement"
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(
+                fields=["payment", "-created_at"], name="paymentevent_payment_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.payment_id} - {self.get_source_display()}: {self.status}"
+
+
+class WebhookJob(models.Model):
+    """
+    Notification Arzeka reçue par le webhook, en attente de traitement
+
+    Le webhook se contente d'enregistrer la notification ; la commande
+    process_webhooks les traite par lots en appliquant le statut renvoyé par
+    la passerelle, et non celui de la notification. Les notifications
+    identiques sont dédupliquées grâce à l'empreinte unique du contenu.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "En attente"),
+        ("processing", "En cours de traitement"),
+        ("done", "Traitée"),
+        ("dead", "Abandonnée"),
+    ]
+
+    reference = models.CharField(max_length=100, verbose_name="Référence de paiement")
+    payload = models.JSONField(verbose_name="Notification")
+    payload_hash = models.CharField(
+        max_length=64, unique=True, verbose_name="Empreinte de la notification"
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="Statut"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    available_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Prochaine tentative"
+    )
+    claimed_by = models.CharField(max_length=32, blank=True, default="")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="", verbose_name="Erreur")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Date de réception"
+    )
+
+    class Meta:
+        verbose_name = "Notification Arzeka"
+        verbose_name_plural = "Notifications Arzeka"
+        indexes = [
+            models.Index(
+                fields=["status", "available_at"], name="webhookjob_queue_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reference} ({self.status})"
+
+    @staticmethod
+    def hash_payload(payload):
+        """Empreinte stable d'une notification, indépendante de l'ordre des clés"""
+        raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @classmethod
+    def enqueue(cls, payload):
+        """Enregistre une notification en une insertion, sans doublon"""
+        cls.objects.bulk_create(
+            [
+                cls(
+                    reference=payload["third_party_mapped_order_id"],
+                    payload=payload,
+                    payload_hash=cls.hash_payload(payload),
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class WebhookDeadLetter(models.Model):
+    """Notification abandonnée après épuisement des tentatives de traitement"""
+
+    job = models.OneToOneField(
+        WebhookJob,
+        on_delete=models.CASCADE,
+        related_name="dead_letter",
+        verbose_name="Notification",
+    )
+    reference = models.CharField(max_length=100, verbose_name="Référence de paiement")
+    payload = models.JSONField(verbose_name="Notification")
+    attempts = models.PositiveIntegerField(verbose_name="Tentatives")
+    error = models.TextField(verbose_name="Dernière erreur")
+    failed_at = models.DateTimeField(auto_now_add=True, verbose_name="Date d'abandon")
+
+    class Meta:
+        verbose_name = "Notification abandonnée"
+        verbose_name_plural = "Notifications abandonnées"
+
+    def __str__(self):
+        return f"{self.reference}: {self.error[:50]}"
+
+
+class GatewayToken(models.Model):
+    """
+    Jeton d'accès Arzeka partagé entre tous les workers (ligne unique)
+
+    Un seul processus à la fois renouvelle le jeton : il réserve le
+    renouvellement en posant `refreshing_until` par un UPDATE conditionnel.
+    """
+
+    access_token = models.TextField(blank=True, default="")
+    token_type = models.CharField(max_length=20, default="Bearer")
+    expires_at = models.DateTimeField(null=True, blank=True)
+    refreshing_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Jeton Arzeka"
+        verbose_name_plural = "Jetons Arzeka"
+
+    def __str__(self):
+        return f"{self.token_type} (expire le {self.expires_at})"
@@ -0,0 +1,140 @@
+import base64
+import json
+import math
+from datetime import datetime
+
+from django.db.models import Q
+
+FIRST, NEXT, PREVIOUS, LAST = "first", "next", "previous", "last"
+
+
+def encode_cursor(direction, payment=None, number=None):
+    """Encode un curseur opaque à partir de la position (created_at, id)"""
+    key = [payment.created_at.isoformat(), payment.pk] if payment else None
+    raw = json.dumps([direction, key, number], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par encode_cursor
+
+    Returns:
+        tuple: (direction, clé, numéro de page), ou None si le curseur est
+        invalide (modifié, tronqué ou d'un autre format)
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        direction, key, number = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        if direction in (NEXT, PREVIOUS):
+            created_at, pk = key
+            key = (datetime.fromisoformat(created_at), pk)
+            if key[0].tzinfo is None or type(pk) is not int:
+                return None
+        elif direction != LAST or key is not None:
+            return None
+    except (ValueError, TypeError):
+        return None
+    if number is not None and (type(number) is not int or number < 1):
+        return None
+    return direction, key, number
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur sur (created_at, id), du plus récent au plus ancien
+
+    Chaque page coûte une seule requête indexée (LIMIT sans OFFSET), quelle que
+    soit sa profondeur. Le nombre de pages n'est calculé que si `count` est
+    fourni.
+    """
+
+    def __init__(self, queryset, per_page, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count = count
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, math.ceil(self.count / self.per_page))
+
+    @property
+    def last_cursor(self):
+        return encode_cursor(LAST, number=self.num_pages)
+
+    def page(self, cursor=None):
+        # Un curseur invalide ramène à la première page
+        direction, key, number = (cursor and decode_cursor(cursor)) or (FIRST, None, 1)
+        queryset = self.queryset
+
+        # La borne simple sur created_at permet au SGBD de se positionner
+        # directement dans l'index au lieu de le parcourir depuis le début
+        if direction == NEXT:
+            created_at, pk = key
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(pk__lt=pk)
+            )
+        elif direction == PREVIOUS:
+            created_at, pk = key
+            queryset = queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(pk__gt=pk)
+            )
+
+        if direction in (PREVIOUS, LAST):
+            page_size = self.per_page
+            if direction == LAST and self.count:
+                # Aligner la dernière page sur le découpage depuis le début
+                page_size = self.count - (self.num_pages - 1) * self.per_page
+            rows = list(queryset.order_by("created_at", "pk")[: page_size + 1])
+            has_more = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            has_previous, has_next = has_more, direction == PREVIOUS
+        else:
+            rows = list(queryset.order_by("-created_at", "-pk")[: self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            has_previous, has_next = direction == NEXT, has_more
+
+        return KeysetPage(rows, number, has_previous, has_next, self)
+
+
+class KeysetPage:
+    """Page exposant l'interface de django.core.paginator.Page utile aux templates"""
+
+    def __init__(self, object_list, number, has_previous, has_next, paginator):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        number = self.number + 1 if self.number else None
+        return encode_cursor(NEXT, self.object_list[-1], number)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        number = self.number - 1 if self.number else None
+        return encode_cursor(PREVIOUS, self.object_list[0], number)
@@ -0,0 +1,144 @@
+import math
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from app.search import normalize_phone
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Limites « N/période » (s, m, h ou d) par adresse IP et par numéro de
+# téléphone ; une limite vide est désactivée
+PAYMENT_CREATE_RATE_IP = getattr(settings, "PAYMENT_CREATE_RATE_IP", "10/m")
+PAYMENT_CREATE_RATE_PHONE = getattr(settings, "PAYMENT_CREATE_RATE_PHONE", "5/m")
+PAYMENT_VERIFY_RATE_IP = getattr(settings, "PAYMENT_VERIFY_RATE_IP", "60/m")
+PAYMENT_VERIFY_RATE_PHONE = getattr(settings, "PAYMENT_VERIFY_RATE_PHONE", "20/m")
+
+
+class RateLimitBusyError(Exception):
+    """Le seau d'une clé est resté verrouillé trop longtemps"""
+
+
+def parse_rate(rate):
+    """« 10/m » donne (10, 10 / 60) : capacité et jetons rechargés par seconde"""
+    count, period = rate.split("/")
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+@contextmanager
+def cache_lock(key, wait=1.0):
+    """
+    Verrou court partagé entre workers, fondé sur l'atomicité de cache.add
+
+    Le cache par défaut est commun à tous les processus (table en base ou
+    Redis, voir app.checks) : add y est atomique. Le verrou expire de
+    lui-même si son détenteur disparaît.
+    """
+    cache = caches["default"]
+    lock_key = f"{key}:lock"
+    give_up_at = time.monotonic() + wait
+    while not cache.add(lock_key, 1, timeout=5):
+        if time.monotonic() > give_up_at:
+            raise RateLimitBusyError(key)
+        time.sleep(0.001)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+class TokenBucket:
+    """
+    Seau à jetons par clé (IP, téléphone), conservé dans le cache par défaut
+
+    Chaque clé dispose de `capacity` jetons, rechargés en continu sur la
+    période : la limite « 10/m » admet une rafale de 10 requêtes puis une
+    requête toutes les 6 secondes. Le seau est partagé entre workers par le
+    cache par défaut : la limite vaut pour l'ensemble des processus.
+    """
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.capacity, self.refill_rate = parse_rate(rate)
+
+    def consume(self, key):
+        """
+        Prend un jeton pour `key`
+
+        Returns:
+            float: 0 si la requête est admise, sinon le délai (secondes)
+            avant qu'un jeton soit disponible
+        """
+        cache = caches["default"]
+        cache_key = f"ratelimit:{self.name}:{key}"
+        try:
+            with cache_lock(cache_key):
+                now = time.time()
+                tokens, updated_at = cache.get(cache_key, (self.capacity, now))
+                tokens = min(
+                    self.capacity, tokens + (now - updated_at) * self.refill_rate
+                )
+                admitted = tokens >= 1
+                if admitted:
+                    tokens -= 1
+                # Un seau plein est équivalent à une clé absente
+                full_after = (self.capacity - tokens) / self.refill_rate
+                cache.set(cache_key, (tokens, now), timeout=math.ceil(full_after) + 1)
+        except RateLimitBusyError:
+            # Requêtes simultanées en masse pour la même clé
+            return 1 / self.refill_rate
+        return 0.0 if admitted else (1 - tokens) / self.refill_rate
+
+
+def _buckets(name, ip_rate, phone_rate):
+    return (
+        TokenBucket(f"{name}-ip", ip_rate) if ip_rate else None,
+        TokenBucket(f"{name}-phone", phone_rate) if phone_rate else None,
+    )
+
+
+LIMITS = {
+    "create": _buckets("create", PAYMENT_CREATE_RATE_IP, PAYMENT_CREATE_RATE_PHONE),
+    "verify": _buckets("verify", PAYMENT_VERIFY_RATE_IP, PAYMENT_VERIFY_RATE_PHONE),
+}
+
+
+def client_ip(request):
+    """Adresse du client ; derrière un proxy, celui-ci doit renseigner REMOTE_ADDR"""
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def check_limits(scope, request=None, phone=None):
+    """
+    Applique les limites de `scope` à l'IP de la requête puis au téléphone
+
+    Returns:
+        float: 0 si la requête est admise, sinon le délai d'attente (secondes)
+    """
+    ip_bucket, phone_bucket = LIMITS[scope]
+    if ip_bucket and request is not None:
+        retry_after = ip_bucket.consume(client_ip(request))
+        if retry_after:
+            return retry_after
+    phone = normalize_phone(phone or "")
+    if phone_bucket and phone:
+        return phone_bucket.consume(phone)
+    return 0.0
+
+
+def too_many_requests(retry_after, message=None, json=False):
+    """Réponse 429 avec l'en-tête Retry-After"""
+    message = message or (
+        "Trop de requêtes, veuillez réessayer dans quelques instants."
+    )
+    if json:
+        response = JsonResponse({"success": False, "message": message}, status=429)
+    else:
+        response = HttpResponse(
+            message, status=429, content_type="text/plain; charset=utf-8"
+        )
+    response["Retry-After"] = str(math.ceil(retry_after))
+    return response
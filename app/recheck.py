@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connection
+
+from app.gateway import check_payment
+from app.models import Payment
+
+RECHECK_WORKERS = getattr(settings, "PAYMENT_RECHECK_WORKERS", 8)
+RECHECK_TIMEOUT = getattr(settings, "PAYMENT_RECHECK_TIMEOUT", 20)
+
+
+def recheck_payments(payments, workers=None, timeout=None):
+    """
+    Revérifie des paiements auprès d'Arzeka sur un pool de threads borné
+
+    Les réponses obtenues avant `timeout` secondes sont appliquées en une
+    écriture groupée (Payment.apply_gateway_responses) ; les vérifications
+    encore en attente sont abandonnées, pour qu'une passerelle lente ne fasse
+    pas expirer la requête de l'admin.
+
+    Returns:
+        tuple: (lignes de résumé par paiement, durée totale en secondes)
+    """
+    start = time.perf_counter()
+    payments = list(payments)
+    executor = ThreadPoolExecutor(
+        max_workers=workers or RECHECK_WORKERS, thread_name_prefix="recheck"
+    )
+    futures = {
+        executor.submit(fetch_status, payment.reference): payment
+        for payment in payments
+    }
+    wait(futures, timeout=timeout or RECHECK_TIMEOUT)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    responses, errors = [], {}
+    for future, payment in futures.items():
+        if not future.done() or future.cancelled():
+            errors[payment.pk] = "Délai dépassé, non vérifié"
+        elif future.exception() is not None:
+            errors[payment.pk] = str(future.exception())
+        else:
+            responses.append((payment, future.result()))
+
+    previous = {payment.pk: payment.status for payment in payments}
+    statuses = Payment.apply_gateway_responses(responses, source="check")
+
+    rows = [
+        {
+            "payment": payment,
+            "previous": previous[payment.pk],
+            "status": statuses.get(payment.pk),
+            "error": errors.get(payment.pk, ""),
+        }
+        for payment in payments
+    ]
+    return rows, time.perf_counter() - start
+
+
+def fetch_status(reference):
+    try:
+        return check_payment(reference)
+    finally:
+        # Connexion ouverte par l'authentification, propre à ce thread
+        connection.close()
@@ -0,0 +1,193 @@
+import logging
+import random
+import time
+
+import requests
+from django.core.cache import caches
+from fasoarzeka.exceptions import ArzekaAPIError, ArzekaConnectionError
+
+from app.cache import incr_stat
+from app.metrics import GATEWAY_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayUnavailableError(ArzekaConnectionError):
+    """Appel refusé sans contacter la passerelle, jugée indisponible"""
+
+
+class GatewayBusyError(ArzekaConnectionError):
+    """Appel refusé : le plafond d'appels simultanés à la passerelle est atteint"""
+
+
+def is_gateway_failure(error):
+    """Erreur imputable à la passerelle (et non à la requête envoyée)"""
+    if isinstance(error, ArzekaConnectionError):
+        return True
+    if isinstance(error, ArzekaAPIError):
+        status = error.status_code
+        return status is None or status == 429 or status >= 500
+    return False
+
+
+def is_request_unsent(error):
+    """La connexion a échoué avant l'envoi : rejouer ne crée aucun doublon"""
+    # fasoarzeka enveloppe les exceptions de requests : ConnectTimeout est
+    # une ConnectionError, contrairement à ReadTimeout
+    return isinstance(error, ArzekaConnectionError) and isinstance(
+        error.__cause__, requests.ConnectionError
+    )
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur partagé entre workers via le cache par défaut (qui doit être
+    commun à tous les processus, voir app.checks)
+
+    Après `failure_threshold` appels consécutifs en échec (une fois leurs
+    nouvelles tentatives épuisées), le disjoncteur s'ouvre : les appels
+    échouent immédiatement pendant `recovery_timeout` secondes. Il passe
+    ensuite en semi-ouvert : un seul appel d'essai, tous workers confondus,
+    décide de sa fermeture ou d'une nouvelle ouverture.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures_key = f"breaker:{name}:failures"
+        self.opened_key = f"breaker:{name}:opened-until"
+        self.probe_key = f"breaker:{name}:probe"
+
+    @property
+    def cache(self):
+        return caches["default"]
+
+    @property
+    def state(self):
+        opened_until = self.cache.get(self.opened_key)
+        if opened_until is None:
+            return self.CLOSED
+        return self.OPEN if time.time() < opened_until else self.HALF_OPEN
+
+    def allow(self):
+        """Indique si un appel peut être tenté maintenant"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        # La réservation expire si le worker d'essai disparaît sans réponse
+        return self.cache.add(self.probe_key, 1, timeout=self.recovery_timeout)
+
+    def record_success(self):
+        if self.cache.get_many([self.failures_key, self.opened_key]):
+            self.cache.delete_many([self.failures_key, self.opened_key, self.probe_key])
+            logger.info("Disjoncteur %s refermé", self.name)
+
+    def record_failure(self):
+        if self.state == self.CLOSED:
+            failures = incr_stat(self.failures_key)
+            if failures < self.failure_threshold:
+                return
+        self.cache.set(self.opened_key, time.time() + self.recovery_timeout, None)
+        self.cache.delete_many([self.failures_key, self.probe_key])
+        logger.warning(
+            "Disjoncteur %s ouvert pour %s s", self.name, self.recovery_timeout
+        )
+
+
+class RetryBudget:
+    """
+    Budget de nouvelles tentatives partagé entre workers
+
+    Par fenêtre de `window` secondes, les nouvelles tentatives sont limitées
+    à `minimum` plus `ratio` fois le nombre d'appels : une passerelle en
+    difficulté reçoit au plus (1 + ratio) fois la charge normale.
+    """
+
+    def __init__(self, name, ratio=0.1, minimum=10, window=10):
+        self.name = name
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+
+    def key(self, kind):
+        return f"retry-budget:{self.name}:{kind}:{int(time.time() // self.window)}"
+
+    def record_call(self):
+        incr_stat(self.key("calls"), timeout=self.window * 2)
+
+    def try_spend(self):
+        """Réserve une nouvelle tentative ; False si le budget est épuisé"""
+        calls = caches["default"].get(self.key("calls"), 0)
+        retries = incr_stat(self.key("retries"), timeout=self.window * 2)
+        return retries <= self.minimum + self.ratio * calls
+
+
+def call_with_resilience(
+    operation,
+    func,
+    *args,
+    breaker,
+    budget,
+    max_retries=2,
+    backoff=0.2,
+    timeout=30,
+    deadline=60,
+    idempotent=True,
+):
+    """
+    Appelle la passerelle derrière le disjoncteur, avec nouvelles tentatives
+
+    Les échecs de la passerelle sont rejoués au plus `max_retries` fois, avec
+    une attente exponentielle aléatoire (full jitter), tant que le budget
+    global le permet. Une tentative qui pourrait, avec sa durée maximale
+    `timeout`, finir au-delà de `deadline` secondes n'est pas commencée. Un
+    appel non idempotent n'est rejoué que si la requête n'est jamais partie.
+
+    Raises:
+        GatewayUnavailableError: si le disjoncteur est ouvert
+    """
+    if not breaker.allow():
+        raise GatewayUnavailableError(
+            "La passerelle Arzeka est momentanément indisponible, "
+            "veuillez réessayer dans quelques instants."
+        )
+
+    budget.record_call()
+    give_up_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        try:
+            result = func(*args)
+        except Exception as e:
+            if not is_gateway_failure(e):
+                if isinstance(e, ArzekaAPIError):
+                    # La passerelle a répondu (erreur 4xx) : elle est disponible
+                    breaker.record_success()
+                raise
+
+            delay = random.uniform(0, backoff * 2**attempt)
+            retryable = idempotent or is_request_unsent(e)
+            give_up = (
+                not retryable
+                or attempt >= max_retries
+                or time.monotonic() + delay + timeout > give_up_at
+                or not breaker.allow()
+            )
+            if not give_up and not budget.try_spend():
+                GATEWAY_RETRIES.labels(operation, "budget_exhausted").inc()
+                give_up = True
+            if give_up:
+                # Un seul échec par appel, quel que soit le nombre de tentatives
+                breaker.record_failure()
+                raise
+            GATEWAY_RETRIES.labels(operation, "retried").inc()
+            attempt += 1
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,42 @@
+import re
+import unicodedata
+
+# Plus grand caractère utilisable comme borne haute d'une recherche par préfixe
+PREFIX_END = "\U0010ffff"
+
+REFERENCE_RE = re.compile(r"^et[\d.]", re.IGNORECASE)
+PHONE_RE = re.compile(r"^\+?[\d ]{4,}$")
+
+
+def normalize(value):
+    """Minuscules sans accents : « Ouédraogo » devient « ouedraogo »"""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(*values):
+    """Mots normalisés (lettres et chiffres) des valeurs, sans doublon"""
+    return {token for value in values for token in re.findall(r"\w+", normalize(value))}
+
+
+def normalize_phone(value):
+    """Numéro au format stocké (226XXXXXXXX), sans espaces ni +"""
+    digits = re.sub(r"\D", "", value)
+    if len(digits) == 8:
+        digits = f"226{digits}"
+    return digits
+
+
+def normalize_reference(value):
+    """Référence au format stocké (eT…) : la comparaison est sensible à la casse"""
+    return f"eT{value[2:]}"
+
+
+def prefix_range(field, prefix):
+    """
+    Filtre « commence par » sous forme d'intervalle
+
+    Contrairement à LIKE 'x%' (non indexé sous SQLite hors collation NOCASE),
+    l'intervalle [x, x + U+10FFFF) est résolu par l'index de la colonne.
+    """
+    return {f"{field}__gte": prefix, f"{field}__lt": prefix + PREFIX_END}
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+
+from django.conf import settings
+
+from app.models import Payment
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_STREAM_POLL_INTERVAL = getattr(settings, "PAYMENT_STREAM_POLL_INTERVAL", 1.0)
+
+
+def status_row(payment):
+    """Statut d'un paiement tel qu'envoyé aux flux, avec sa version"""
+    return {
+        "status": payment["status"],
+        "label": dict(Payment.STATUS_CHOICES)[payment["status"]],
+        "updated_at": payment["updated_at"].isoformat(),
+    }
+
+
+class StatusNotifier:
+    """
+    Diffuse les changements de statut aux flux SSE ouverts dans le processus
+
+    Une seule tâche par boucle d'événements relit, toutes les `interval`
+    secondes et en une requête, le statut de tous les paiements suivis, puis
+    pousse les changements dans la file de chaque abonné : le coût ne dépend
+    plus du nombre de pages ouvertes. La tâche s'arrête avec le dernier
+    abonné. Un abonné reçoit None si son paiement a été supprimé.
+    """
+
+    def __init__(self, interval=PAYMENT_STREAM_POLL_INTERVAL):
+        self.interval = interval
+        self._subscribers = defaultdict(set)
+        # Dernier statut lu par paiement suivi
+        self._rows = {}
+        self._task = None
+
+    def subscribe(self, payment_id, version=None):
+        """
+        Abonne une nouvelle file aux changements du paiement
+
+        Si un statut plus récent que `version` est déjà connu, il est placé
+        d'emblée dans la file.
+        """
+        queue = asyncio.Queue()
+        self._subscribers[payment_id].add(queue)
+        row = self._rows.get(payment_id)
+        if row is not None and row["updated_at"] != version:
+            queue.put_nowait(row)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, payment_id, queue):
+        queues = self._subscribers.get(payment_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[payment_id]
+            self._rows.pop(payment_id, None)
+
+    async def _run(self):
+        try:
+            while self._subscribers:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.poll()
+                except Exception:
+                    logger.exception("Relecture des statuts suivis impossible")
+        finally:
+            self._task = None
+
+    async def poll(self):
+        """Relit les paiements suivis et notifie les changements"""
+        ids = list(self._subscribers)
+        rows = {
+            payment["id"]: status_row(payment)
+            async for payment in Payment.objects.filter(pk__in=ids).values(
+                "id", "status", "updated_at"
+            )
+        }
+        for payment_id in ids:
+            row = rows.get(payment_id)
+            if row is not None and row == self._rows.get(payment_id):
+                continue
+            if payment_id in self._subscribers:
+                self._rows[payment_id] = row
+            for queue in self._subscribers.get(payment_id, ()):
+                queue.put_nowait(row)
+
+
+# Un diffuseur par boucle d'événements (un worker ASGI = une boucle)
+_notifiers = weakref.WeakKeyDictionary()
+
+
+def get_notifier():
+    """Retourne le diffuseur de la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    notifier = _notifiers.get(loop)
+    if notifier is None:
+        notifier = _notifiers[loop] = StatusNotifier()
+    return notifier
+
+
+def status_event(row):
+    return f"id: {row['updated_at']}\nevent: status\ndata: {json.dumps(row)}\n\n"
+
+
+async def status_events(payment, last_event_id=None, max_duration=300):
+    """
+    Événements SSE d'un paiement, à partir de son statut courant `payment`
+
+    L'identifiant d'événement est la version (updated_at) déjà envoyée : un
+    client qui se reconnecte ne reçoit que les changements postérieurs. Le
+    flux se ferme sur un statut définitif ou après `max_duration` secondes.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_duration
+    notifier = get_notifier()
+    row = status_row(payment)
+
+    # Indication de délai de reconnexion pour EventSource
+    yield f"retry: {int(notifier.interval * 1000)}\n\n"
+    if row["updated_at"] != last_event_id:
+        yield status_event(row)
+        if row["status"] not in Payment.OPEN_STATUSES:
+            return
+
+    version = row["updated_at"]
+    queue = notifier.subscribe(payment["id"], version)
+    try:
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                row = await asyncio.wait_for(queue.get(), min(15, remaining))
+            except asyncio.TimeoutError:
+                # Commentaire SSE gardant la connexion ouverte derrière les proxys
+                yield ": ping\n\n"
+                continue
+            if row is None:
+                return
+            if row["updated_at"] == version:
+                continue
+            version = row["updated_at"]
+            yield status_event(row)
+            if row["status"] not in Payment.OPEN_STATUSES:
+                return
+    finally:
+        notifier.unsubscribe(payment["id"], queue)
@@ -0,0 +1,185 @@
+import base64
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from fasoarzeka.constants import (
+    AUTH_ENDPOINT,
+    INITIATE_PAYMENT_ENDPOINT,
+    PAYMENT_BASE_URL,
+    PAYMENT_VERIFICATION_ENDPOINT,
+)
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Décode les requêtes de fasoarzeka et les transmet au simulateur"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode()
+        # fasoarzeka envoie des formulaires ; la vérification passe la
+        # référence dans l'URL
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        params.update({key: values[-1] for key, values in parse_qs(body).items()})
+
+        status, data = self.server.stub.respond(url.path, params)
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ArzekaStub:
+    """
+    Passerelle Arzeka simulée, pour les tests de charge hors ligne
+
+    Le serveur HTTP répond aux points d'accès utilisés par l'application
+    (authentification, initiation et vérification). Chaque réponse est
+    retardée de `min_latency` à `max_latency` secondes et une fraction
+    `error_rate` des initiations et vérifications échoue (HTTP 500).
+
+    Après une initiation, le statut final du paiement (INCOMPLETE avec la
+    probabilité `failure_rate`, COMPLETED sinon) est envoyé au webhook
+    `linkForUpdateStatus` au bout de `webhook_delay` secondes.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        min_latency=0.0,
+        max_latency=0.0,
+        error_rate=0.0,
+        failure_rate=0.1,
+        webhook_delay=0.5,
+        webhook_workers=16,
+    ):
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.webhook_delay = webhook_delay
+
+        self.lock = threading.Lock()
+        # Statut Arzeka de chaque paiement initié, par référence
+        self.orders = {}
+        # Durée et succès de chaque appel au webhook
+        self.webhooks = []
+
+        self.server = ThreadingHTTPServer((host, port), StubRequestHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self._stopped = threading.Event()
+        # Le délai étant constant, les notifications sont dues dans l'ordre
+        # d'arrivée : une simple file suffit
+        self._due = queue.Queue()
+        self._webhook_pool = ThreadPoolExecutor(
+            max_workers=webhook_workers, thread_name_prefix="arzeka-stub-webhook"
+        )
+        self._threads = []
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        """Démarre le serveur et l'envoi des webhooks en arrière-plan"""
+        for target in (self.server.serve_forever, self._dispatch_webhooks):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self._webhook_pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, path, params):
+        """Retourne le code HTTP et le corps JSON de la réponse à `path`"""
+        time.sleep(random.uniform(self.min_latency, self.max_latency))
+
+        if path.endswith(PAYMENT_BASE_URL + AUTH_ENDPOINT):
+            return 200, {
+                "access_token": uuid.uuid4().hex,
+                "token_type": "Bearer",
+                "expires_in": 3600,
+            }
+
+        if random.random() < self.error_rate:
+            return 500, {"message": "Erreur simulée de la passerelle"}
+
+        reference = params.get("mappedOrderId")
+        if path.endswith(PAYMENT_BASE_URL + INITIATE_PAYMENT_ENDPOINT):
+            with self.lock:
+                self.orders[reference] = "PENDING"
+            link = base64.b64decode(params["linkForUpdateStatus"]).decode()
+            self._due.put((time.monotonic() + self.webhook_delay, link, reference))
+            return 200, {"url": f"{self.url}pay/{reference}"}
+
+        if path.endswith(PAYMENT_BASE_URL + PAYMENT_VERIFICATION_ENDPOINT):
+            with self.lock:
+                status = self.orders.get(reference)
+            if status is None:
+                return 404, {"message": f"La référence {reference} est inconnue"}
+            return 200, self.payment_data(reference, status)
+
+        return 404, {"message": f"Point d'accès inconnu : {path}"}
+
+    @staticmethod
+    def payment_data(reference, status):
+        """Notification ou réponse de vérification pour un paiement"""
+        return {
+            "third_party_mapped_order_id": reference,
+            "third_party_trans_id": f"STUB-{reference}",
+            "status": status,
+        }
+
+    def _dispatch_webhooks(self):
+        while not self._stopped.is_set():
+            try:
+                due, link, reference = self._due.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self._stopped.wait(max(0.0, due - time.monotonic())):
+                return
+            self._webhook_pool.submit(self.notify, link, reference)
+
+    def notify(self, link, reference):
+        """Fixe le statut final du paiement puis appelle le webhook"""
+        status = "INCOMPLETE" if random.random() < self.failure_rate else "COMPLETED"
+        with self.lock:
+            self.orders[reference] = status
+
+        start = time.perf_counter()
+        try:
+            ok = requests.post(
+                link, json=self.payment_data(reference, status), timeout=30
+            ).ok
+        except requests.RequestException:
+            ok = False
+        with self.lock:
+            self.webhooks.append((time.perf_counter() - start, ok))
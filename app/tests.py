@@ -1,3 +1,1081 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+import requests
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count, F, Sum
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from fasoarzeka.exceptions import (
+    ArzekaAPIError,
+    ArzekaAuthenticationError,
+    ArzekaConnectionError,
+)
+
+from app import gateway
+from app.admin import PaymentAdmin
+from app.cache import fragment_stats
+from app.management.commands.reconcile_payments import (
+    Command as ReconcileCommand,
+)
+from app.checks import check_shared_cache
+from app.metrics import gateway_error_label
+from app.models import (
+    GatewayToken,
+    Payment,
+    PaymentEvent,
+    PaymentRollup,
+    PaymentStatusCounter,
+    WebhookJob,
+)
+from app.ratelimit import LIMITS, TokenBucket, _buckets
+from app.resilience import (
+    CircuitBreaker,
+    GatewayBusyError,
+    GatewayUnavailableError,
+    RetryBudget,
+    call_with_resilience,
+)
+from app.streams import StatusNotifier
+from web.utils import ReferenceGenerator
+
+
+def create_payment(reference, status="pending"):
+    return Payment.objects.create(
+        lastname="Ouedraogo",
+        firstname="Awa",
+        phone="22670000000",
+        amount=1000,
+        reference=reference,
+        status=status,
+    )
+
+
+class PaymentTransitionTests(TestCase):
+    def test_allowed_transition_updates_status_and_counters(self):
+        payment = create_payment("eT-1")
+
+        self.assertTrue(payment.transition_to("completed", transaction_id="T1"))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "completed")
+        self.assertEqual(payment.transaction_id, "T1")
+        counts = PaymentStatusCounter.get_counts()
+        self.assertEqual((counts["pending"], counts["completed"]), (0, 1))
+
+    def test_completed_payment_never_goes_back(self):
+        payment = create_payment("eT-2", status="completed")
+
+        self.assertFalse(payment.transition_to("pending"))
+        payment.record_gateway_response({"status": "PENDING"}, source="webhook")
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "completed")
+        self.assertEqual(payment.events.count(), 1)
+
+    def test_stale_instance_rereads_status(self):
+        payment = create_payment("eT-3")
+        stale = Payment.objects.get(pk=payment.pk)
+        payment.transition_to("completed")
+
+        # L'instance périmée croit le paiement en attente : la transition
+        # vers "failed" doit être refusée après relecture du statut
+        self.assertFalse(stale.transition_to("failed"))
+        self.assertEqual(stale.status, "completed")
+
+    def test_bulk_transition_skips_rows_changed_meanwhile(self):
+        first, second = create_payment("eT-4"), create_payment("eT-5")
+        second.transition_to("completed")
+
+        updated = Payment.bulk_transition([first.pk, second.pk], "pending", "failed")
+
+        self.assertEqual(updated, [first.pk])
+        self.assertEqual(
+            dict(Payment.objects.values_list("reference", "status")),
+            {"eT-4": "failed", "eT-5": "completed"},
+        )
+
+
+class PaymentRollupTests(TestCase):
+    def assertRollupsMatchPayments(self):
+        actual = {
+            row["status"]: (row["count"], row["amount"])
+            for row in Payment.objects.order_by()
+            .values("status")
+            .annotate(count=Count("id"), amount=Sum("amount"))
+        }
+        for granularity in (PaymentRollup.HOUR, PaymentRollup.DAY):
+            stored = {
+                row["status"]: (row["count"], row["amount"])
+                for row in PaymentRollup.objects.filter(granularity=granularity)
+                .values("status")
+                .annotate(count=Sum("count"), amount=Sum("amount"))
+                if row["count"] or row["amount"]
+            }
+            self.assertEqual(stored, actual, granularity)
+        call_command("rebuild_payment_rollups", "--check", stdout=StringIO())
+
+    def test_rollups_follow_every_write_path(self):
+        payments = [create_payment(f"eT-rollup-{i}") for i in range(6)]
+        self.assertRollupsMatchPayments()
+
+        payments[0].transition_to("completed")
+        self.assertRollupsMatchPayments()
+
+        # payments[0] n'est plus en attente : ignoré par la transition groupée
+        ids = [payment.pk for payment in payments[:4]]
+        self.assertEqual(len(Payment.bulk_transition(ids, "pending", "failed")), 3)
+        self.assertRollupsMatchPayments()
+
+        payments[4].amount = 2500
+        payments[4].save()
+        self.assertRollupsMatchPayments()
+
+        payments[5].delete()
+        self.assertRollupsMatchPayments()
+
+        Payment.bulk_delete(Payment.objects.filter(pk__in=ids[:2]))
+        self.assertRollupsMatchPayments()
+
+    def test_backfill_and_check(self):
+        for i in range(3):
+            create_payment(f"eT-rollup-{i}").transition_to("completed")
+        create_payment("eT-rollup-3")
+
+        PaymentRollup.objects.all().delete()
+        populate_rollups = importlib.import_module(
+            "app.migrations.0012_paymentrollup"
+        ).populate_rollups
+        populate_rollups(django_apps, None)
+        self.assertRollupsMatchPayments()
+
+        PaymentRollup.objects.filter(status="pending").update(count=F("count") + 1)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_payment_rollups", "--check", stdout=StringIO())
+        call_command("rebuild_payment_rollups", stdout=StringIO())
+        self.assertRollupsMatchPayments()
+
+    def test_rebuild_upserts_buckets_created_meanwhile(self):
+        create_payment("eT-rollup-0")
+        PaymentRollup.objects.all().delete()
+        bulk_create = PaymentRollup.objects.bulk_create
+
+        def concurrent_adjust(objs, **kwargs):
+            # Période créée par PaymentRollup.adjust pendant la reconstruction
+            PaymentRollup.adjust([(timezone.now(), "pending", 1, 1000)])
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(PaymentRollup.objects, "bulk_create", concurrent_adjust):
+            call_command("rebuild_payment_rollups", stdout=StringIO())
+        # La reconstruction l'emporte : la variation concurrente, déjà
+        # comptée dans le paiement, n'est pas ajoutée une seconde fois
+        self.assertRollupsMatchPayments()
+
+
+class PaymentStatusCounterTests(TestCase):
+    def test_every_status_has_a_counter(self):
+        self.assertEqual(
+            set(PaymentStatusCounter.objects.values_list("status", flat=True)),
+            {status for status, _ in Payment.STATUS_CHOICES},
+        )
+
+    def test_admin_bulk_delete_adjusts_counters(self):
+        payments = [create_payment(f"eT-del-{i}") for i in range(3)]
+        payments[0].transition_to("completed")
+        create_payment("eT-del-kept")
+
+        PaymentAdmin(Payment, admin.site).delete_queryset(
+            None,
+            Payment.objects.filter(reference__startswith="eT-del-").exclude(
+                reference="eT-del-kept"
+            ),
+        )
+
+        counts = PaymentStatusCounter.get_counts()
+        self.assertEqual((counts["pending"], counts["completed"]), (1, 0))
+        self.assertEqual(Payment.objects.get().reference, "eT-del-kept")
+
+
+class ReferenceGeneratorTests(SimpleTestCase):
+    processes = 4
+    references = 20000
+
+    def test_forked_workers_with_a_node_id_generate_unique_references(self):
+        generator = ReferenceGenerator(node_id=7)
+        generator()
+
+        children = []
+        for _ in range(self.processes):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # Processus enfant, comme un worker gunicorn après --preload
+                os.close(read_fd)
+                with os.fdopen(write_fd, "w") as pipe:
+                    pipe.write("\n".join(generator() for _ in range(self.references)))
+                os._exit(0)
+            os.close(write_fd)
+            children.append((pid, read_fd))
+
+        references = []
+        for pid, read_fd in children:
+            with os.fdopen(read_fd) as pipe:
+                references.extend(pipe.read().split("\n"))
+            os.waitpid(pid, 0)
+
+        self.assertEqual(len(references), self.processes * self.references)
+        self.assertEqual(len(set(references)), len(references))
+
+
+class AsyncPaymentFormTests(TestCase):
+    data = {
+        "lastname": "Ouedraogo",
+        "firstname": "Awa",
+        "phone": "+22670000001",
+        "amount": "1000",
+    }
+
+    def setUp(self):
+        caches["default"].clear()
+
+    async def submit(self, initiate_payment):
+        with mock.patch.object(gateway, "initiate_payment", initiate_payment):
+            return await self.async_client.post(
+                reverse("app:payment-form-async"), self.data
+            )
+
+    async def test_payment_is_initiated_in_a_worker_thread(self):
+        threads = []
+
+        def initiate_payment(payment_data):
+            # Requête en base depuis le thread, comme l'authentification
+            Payment.objects.exists()
+            threads.append(connections["default"])
+            return {"url": "http://gateway.test/pay"}, payment_data
+
+        response = await self.submit(initiate_payment)
+
+        payment = await Payment.objects.aget()
+        self.assertRedirects(
+            response,
+            reverse("app:payment-detail", args=[payment.pk]),
+            fetch_redirect_response=False,
+        )
+        self.assertTrue(
+            await PaymentEvent.objects.filter(
+                payment=payment, source="initiate"
+            ).aexists()
+        )
+        # Connexion du thread fermée après l'appel
+        self.assertIsNone(threads[0].connection)
+
+    async def test_gateway_timeout_shows_the_form_again(self):
+        def initiate_payment(payment_data):
+            time.sleep(0.5)
+            return {"url": "http://gateway.test/pay"}, payment_data
+
+        with mock.patch.object(gateway, "FASOARZEKA_DEADLINE", 0.05):
+            response = await self.submit(initiate_payment)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "ne répond pas")
+
+    async def test_busy_gateway_answers_429(self):
+        def initiate_payment(payment_data):
+            raise GatewayBusyError("Trop de paiements en cours")
+
+        response = await self.submit(initiate_payment)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class PaymentDetailFragmentTests(TestCase):
+    def test_new_event_refreshes_cached_timeline(self):
+        payment = create_payment("eT-fragment-1")
+        url = reverse("app:payment-detail", args=[payment.pk])
+        self.assertNotContains(self.client.get(url), "Relevé de règlement")
+
+        # Événement ajouté sans modifier le paiement (updated_at inchangé)
+        PaymentEvent.objects.create(
+            payment=payment, source="settlement", status="pending", payload={}
+        )
+
+        self.assertContains(self.client.get(url), "Relevé de règlement")
+
+    def test_hits_and_misses_are_counted_in_process(self):
+        payment = create_payment("eT-fragment-2")
+        url = reverse("app:payment-detail", args=[payment.pk])
+        before = fragment_stats()
+
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        after = fragment_stats()
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        # Aucun accès au cache partagé (table en base) pour un fragment servi
+        self.assertFalse([query for query in queries if "arzeka_cache" in query["sql"]])
+
+
+class PaymentStatusStreamTests(TestCase):
+    def test_stream_is_not_served_under_wsgi(self):
+        payment = create_payment("eT-stream-1")
+
+        response = self.client.get(reverse("app:payment-events", args=[payment.pk]))
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.get(reverse("app:payment-detail", args=[payment.pk]))
+        self.assertNotContains(response, "EventSource")
+        # Relecture du statut seul, sans rechargement périodique de la page
+        self.assertContains(response, reverse("app:payment-status", args=[payment.pk]))
+        self.assertNotContains(response, "setTimeout")
+
+    def test_status_endpoint_reads_the_stored_status(self):
+        payment = create_payment("eT-stream-3")
+        url = reverse("app:payment-status", args=[payment.pk])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+
+        payment.refresh_from_db()
+        self.assertEqual(
+            response.json(),
+            {
+                "status": "pending",
+                "label": payment.get_status_display(),
+                "updated_at": payment.updated_at.isoformat(),
+            },
+        )
+        self.assertEqual(
+            self.client.get(url.replace(str(payment.pk), "0")).status_code, 404
+        )
+
+    async def test_one_poller_notifies_every_subscriber(self):
+        payment = await sync_to_async(create_payment)("eT-stream-2")
+        notifier = StatusNotifier(interval=0.01)
+        queues = [notifier.subscribe(payment.pk)]
+        task = notifier._task
+        queues += [notifier.subscribe(payment.pk) for _ in range(2)]
+        # Une seule tâche de relecture pour tous les abonnés
+        self.assertIs(notifier._task, task)
+
+        for queue in queues:
+            row = await asyncio.wait_for(queue.get(), 1)
+            self.assertEqual(row["status"], "pending")
+
+        await sync_to_async(payment.transition_to)("completed")
+        for queue in queues:
+            row = await asyncio.wait_for(queue.get(), 1)
+            self.assertEqual(row["status"], "completed")
+
+        for queue in queues:
+            notifier.unsubscribe(payment.pk, queue)
+        await asyncio.wait_for(task, 1)
+        self.assertIsNone(notifier._task)
+
+
+class CheckPaymentStatusTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def check(self, payment):
+        return self.client.get(
+            reverse("app:check-payment-status"),
+            {"paymentRequestID": payment.reference},
+        )
+
+    def test_cached_answers_are_logged_only_when_status_changes(self):
+        payment = create_payment("eT-check-1")
+
+        with mock.patch.object(
+            gateway, "check_payment", return_value={"status": "PENDING"}
+        ) as check_payment:
+            self.check(payment)
+            self.check(payment)
+        self.assertEqual(check_payment.call_count, 1)
+        self.assertEqual(payment.events.filter(source="check").count(), 1)
+
+        # Réponse en cache qui fait avancer le statut : journalisée
+        caches["default"].set(
+            f"arzeka-check:{payment.reference}",
+            {"status": "COMPLETED", "third_party_trans_id": "T1"},
+        )
+        self.check(payment)
+        self.check(payment)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "completed")
+        self.assertEqual(
+            list(payment.events.values_list("status", flat=True)),
+            ["pending", "completed"],
+        )
+
+
+class PaymentListPaginationTests(TestCase):
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        for i in range(12):
+            create_payment(f"eT-page-{i}")
+        first_page = self.client.get(reverse("app:payment-list"))
+
+        for raw in (
+            b'["next",null,2]',
+            b'["previous",["2026-01-01T00:00:00+00:00",null],1]',
+            b'["next",["2026-01-01T00:00:00",3],1]',
+            b'["next",["2026-01-01T00:00:00+00:00",3],"x"]',
+            b'["last",["2026-01-01T00:00:00+00:00",3],2]',
+            b'{"next":1}',
+            b"not json",
+        ):
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+            response = self.client.get(reverse("app:payment-list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, 200, raw)
+            self.assertEqual(
+                list(response.context["payments"]),
+                list(first_page.context["payments"]),
+                raw,
+            )
+
+
+class PaymentSearchTests(TestCase):
+    def test_reference_prefix_is_case_insensitive(self):
+        payment = create_payment("eT250101.120000.0001")
+        create_payment("eT250102.120000.0001")
+
+        for term in ("eT250101", "et250101", "ET250101", " Et250101.12 "):
+            with self.subTest(term=term):
+                self.assertQuerySetEqual(
+                    Payment.objects.filter(Payment.search_filter(term)), [payment]
+                )
+
+
+class WebhookTests(TestCase):
+    def notify(self, reference, status, **params):
+        url = reverse("app:update-payment-status")
+        if params:
+            url += "?" + urlencode(params)
+        return self.client.post(
+            url,
+            {"third_party_mapped_order_id": reference, "status": status},
+            content_type="application/json",
+        )
+
+    def process(self, gateway_status):
+        with mock.patch(
+            "app.management.commands.process_webhooks.check_payment",
+            return_value={"status": gateway_status, "third_party_trans_id": "T1"},
+        ) as check:
+            call_command("process_webhooks", once=True, stdout=StringIO())
+        return check
+
+    def test_notification_status_is_not_trusted(self):
+        payment = create_payment("eT-hook-1")
+
+        self.assertEqual(self.notify(payment.reference, "COMPLETED").status_code, 200)
+        check = self.process("PENDING")
+
+        check.assert_called_once_with(payment.reference)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "pending")
+
+    def test_gateway_status_is_applied_once_per_reference(self):
+        payment = create_payment("eT-hook-2")
+        self.notify(payment.reference, "COMPLETED")
+        self.notify(payment.reference, "SUCCESS")
+
+        check = self.process("COMPLETED")
+
+        self.assertEqual(check.call_count, 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "completed")
+
+    def test_gateway_checks_run_in_parallel(self):
+        payments = [create_payment(f"eT-hook-par-{i}") for i in range(3)]
+        for payment in payments:
+            self.notify(payment.reference, "COMPLETED")
+        # Chaque vérification attend les deux autres : échoue si séquentiel
+        barrier = threading.Barrier(3, timeout=2)
+
+        def check_payment(reference):
+            barrier.wait()
+            return {"status": "COMPLETED", "third_party_trans_id": reference}
+
+        with mock.patch(
+            "app.management.commands.process_webhooks.check_payment", check_payment
+        ):
+            call_command("process_webhooks", once=True, stdout=StringIO())
+
+        self.assertEqual(
+            WebhookJob.objects.filter(status="done").count(), len(payments)
+        )
+        self.assertFalse(Payment.objects.exclude(status="completed").exists())
+
+    def test_dead_notification_does_not_block_later_ones(self):
+        payload = {"third_party_mapped_order_id": "eT-unknown", "status": "COMPLETED"}
+        WebhookJob.enqueue(payload)
+        call_command("process_webhooks", once=True, max_attempts=1, stdout=StringIO())
+        dead = WebhookJob.objects.get()
+        self.assertEqual(dead.status, "dead")
+        self.assertTrue(dead.dead_letter.error.startswith("DoesNotExist"))
+
+        # La même notification, reçue à nouveau, est mise en file
+        WebhookJob.enqueue(payload)
+        self.assertEqual(WebhookJob.objects.filter(status="pending").count(), 1)
+
+        # Puis purgée avec les autres au-delà de la rétention
+        WebhookJob.objects.update(
+            status="dead", created_at=timezone.now() - timedelta(days=8)
+        )
+        call_command("process_webhooks", once=True, stdout=StringIO())
+        self.assertFalse(WebhookJob.objects.exists())
+
+    def test_secret_is_required_when_configured(self):
+        payment = create_payment("eT-hook-3")
+
+        with mock.patch("app.views.PAYMENT_WEBHOOK_SECRET", "s3cret"):
+            refused = self.notify(payment.reference, "COMPLETED", token="wrong")
+            accepted = self.notify(payment.reference, "COMPLETED", token="s3cret")
+
+        self.assertEqual((refused.status_code, accepted.status_code), (403, 200))
+        self.assertEqual(WebhookJob.objects.count(), 1)
+
+
+class ReconcilePaymentsTests(TestCase):
+    options = {"base_delay": 60, "max_delay": 600}
+
+    def command(self):
+        command = ReconcileCommand(stdout=StringIO(), stderr=StringIO())
+        command.options = self.options
+        return command
+
+    def test_next_delay_doubles_with_jitter_up_to_the_maximum(self):
+        command = self.command()
+        for attempts, base in ((0, 60), (1, 120), (3, 480), (4, 600), (20, 600)):
+            with self.subTest(attempts=attempts):
+                delay = command.next_delay(attempts).total_seconds()
+                self.assertGreaterEqual(delay, base * 0.8)
+                self.assertLessEqual(delay, base * 1.2)
+
+    def test_apply_results_writes_a_batch(self):
+        completed, pending, unanswered = (
+            create_payment(f"eT-reconcile-{i}") for i in range(3)
+        )
+        Payment.objects.filter(pk=pending.pk).update(check_attempts=2)
+        batch = list(Payment.objects.order_by("id"))
+        results = list(
+            zip(batch, [{"status": "COMPLETED"}, {"status": "PENDING"}, None])
+        )
+        before = timezone.now()
+
+        with CaptureQueriesContext(connection) as queries:
+            finalized = self.command().apply_results(results)
+
+        self.assertEqual(finalized, 1)
+        # Suivi des vérifications écrit en une seule requête pour le lot
+        self.assertEqual(
+            sum('SET "check_attempts"' in query["sql"] for query in queries), 1
+        )
+        completed, pending, unanswered = Payment.objects.order_by("id")
+        self.assertEqual(completed.status, "completed")
+        self.assertIsNone(completed.next_check_at)
+        self.assertEqual(pending.check_attempts, 3)
+        # Troisième vérification : délai de base x 4, gigue comprise
+        self.assertGreaterEqual(
+            pending.next_check_at, before + timedelta(seconds=240 * 0.8)
+        )
+        self.assertEqual(unanswered.status, "pending")
+        self.assertEqual(unanswered.check_attempts, 1)
+        self.assertIsNotNone(unanswered.next_check_at)
+        self.assertEqual(
+            list(completed.events.values_list("source", flat=True)), ["reconcile"]
+        )
+
+    def test_sweep_checks_due_payments_once(self):
+        payment = create_payment("eT-reconcile-3")
+
+        with mock.patch(
+            "app.management.commands.reconcile_payments.check_payment",
+            return_value={"status": "COMPLETED"},
+        ) as check:
+            call_command(
+                "reconcile_payments", "--once", "--stale-after=0", stdout=StringIO()
+            )
+            call_command(
+                "reconcile_payments", "--once", "--stale-after=0", stdout=StringIO()
+            )
+
+        check.assert_called_once_with(payment.reference)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "completed")
+
+
+class ImportSettlementTests(TestCase):
+    def import_settlement(self, *lines):
+        with tempfile.TemporaryDirectory() as directory:
+            statement = os.path.join(directory, "statement.csv")
+            report = os.path.join(directory, "report.csv")
+            with open(statement, "w", encoding="utf-8") as f:
+                f.write("mapped_order_id,third_party_trans_id,amount,status\n")
+                f.writelines(f"{line}\n" for line in lines)
+            call_command(
+                "import_settlement", statement, report=report, stdout=StringIO()
+            )
+            with open(report, encoding="utf-8") as f:
+                return list(csv.DictReader(f))
+
+    def test_duplicate_transaction_ids_are_reported(self):
+        first = create_payment("eT-settle-1")
+        second = create_payment("eT-settle-2")
+        settled = create_payment("eT-settle-3", "completed")
+        Payment.objects.filter(pk=settled.pk).update(transaction_id="T3")
+
+        report = self.import_settlement(
+            "eT-settle-1,T1,1000,COMPLETED",
+            "eT-settle-1,T1,1000,COMPLETED",
+            "eT-settle-2,T1,1000,COMPLETED",
+            "eT-settle-3,T3,1000,COMPLETED",
+            "eT-settle-2,T3,1000,COMPLETED",
+        )
+
+        self.assertEqual(
+            [(row["line"], row["issue"], row["payment"]) for row in report],
+            [("4", "duplicate", "eT-settle-1"), ("6", "duplicate", "eT-settle-3")],
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, first.transaction_id), ("completed", "T1"))
+        self.assertEqual((second.status, second.transaction_id), ("completed", None))
+        # La ligne répétée ne produit pas un second événement
+        self.assertEqual(first.events.filter(source="settlement").count(), 1)
+
+    def test_unreadable_or_inexact_amounts_are_reported(self):
+        for i in range(4):
+            create_payment(f"eT-amount-{i}")
+
+        report = self.import_settlement(
+            "eT-amount-0,,NaN,COMPLETED",
+            "eT-amount-1,,inf,COMPLETED",
+            'eT-amount-2,,"1000,50",COMPLETED',
+            "eT-amount-3,T4,1 000.00,COMPLETED",
+        )
+
+        self.assertEqual(
+            [(row["reference"], row["issue"]) for row in report],
+            [(f"eT-amount-{i}", "amount") for i in range(3)],
+        )
+        self.assertEqual(
+            list(Payment.objects.filter(status="completed").values_list("reference")),
+            [("eT-amount-3",)],
+        )
+
+    def test_skipped_transition_writes_nothing(self):
+        payment = create_payment("eT-settle-4")
+
+        # Paiement modifié entre la lecture du lot et la transition
+        with mock.patch.object(Payment, "bulk_transition", return_value=[]):
+            self.import_settlement("eT-settle-4,T5,1000,COMPLETED")
+
+        payment.refresh_from_db()
+        self.assertIsNone(payment.transaction_id)
+        self.assertFalse(payment.events.exists())
+
+    def test_missing_columns_keep_the_previous_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            statement = os.path.join(directory, "statement.csv")
+            report = os.path.join(directory, "report.csv")
+            with open(statement, "w", encoding="utf-8") as f:
+                f.write("reference,amount\n")
+            with open(report, "w", encoding="utf-8") as f:
+                f.write("previous report\n")
+
+            with self.assertRaises(CommandError):
+                call_command("import_settlement", statement, report=report)
+
+            with open(report, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "previous report\n")
+
+
+class MetricsTests(TestCase):
+    def test_gateway_errors_are_labelled_by_cause(self):
+        def wrapped(cause):
+            try:
+                raise ArzekaConnectionError("Arzeka") from cause
+            except ArzekaConnectionError as e:
+                return e
+
+        self.assertEqual(
+            gateway_error_label(wrapped(requests.ReadTimeout())), "timeout"
+        )
+        self.assertEqual(
+            gateway_error_label(wrapped(requests.ConnectionError())), "connection"
+        )
+        self.assertEqual(gateway_error_label(asyncio.TimeoutError()), "timeout")
+        self.assertEqual(gateway_error_label(GatewayBusyError()), "busy")
+        self.assertEqual(
+            gateway_error_label(ArzekaAPIError("Erreur", status_code=502)), "http_5xx"
+        )
+
+    def test_metrics_are_restricted(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        remote = Client(REMOTE_ADDR="10.0.0.9")
+        self.assertEqual(remote.get(url).status_code, 403)
+        with mock.patch("app.views.METRICS_TOKEN", "s3cret"):
+            self.assertEqual(
+                remote.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+            )
+            self.assertEqual(
+                remote.get(url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200
+            )
+
+
+class ResilienceTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def unavailable(self):
+        try:
+            raise ArzekaConnectionError("Arzeka") from requests.ConnectionError()
+        except ArzekaConnectionError as e:
+            return e
+
+    def test_process_local_default_cache_is_rejected(self):
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES={"default": locmem}):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ["app.E001"])
+        self.assertEqual(check_shared_cache(None), [])
+
+    def test_breaker_opens_then_half_opens_then_closes(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30)
+        later = time.time() + 31
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        with mock.patch("app.resilience.time.time", return_value=later):
+            self.assertEqual(breaker.state, breaker.HALF_OPEN)
+            # Un seul appel d'essai
+            self.assertEqual([breaker.allow(), breaker.allow()], [True, False])
+            breaker.record_failure()
+            self.assertEqual(breaker.state, breaker.OPEN)
+
+        with mock.patch("app.resilience.time.time", return_value=later + 31):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_one_breaker_failure_per_call(self):
+        breaker = CircuitBreaker("test", failure_threshold=2)
+        budget = RetryBudget("test")
+        func = mock.Mock(side_effect=self.unavailable())
+
+        def call():
+            with self.assertRaises(ArzekaConnectionError):
+                call_with_resilience(
+                    "test", func, breaker=breaker, budget=budget, backoff=0
+                )
+
+        call()
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        call()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        with self.assertRaises(GatewayUnavailableError):
+            call_with_resilience("test", func, breaker=breaker, budget=budget)
+        self.assertEqual(func.call_count, 6)
+
+    def test_retries_stop_when_budget_is_exhausted(self):
+        breaker = CircuitBreaker("test", failure_threshold=10)
+        budget = RetryBudget("test", ratio=0, minimum=3)
+        func = mock.Mock(side_effect=self.unavailable())
+
+        with self.assertRaises(ArzekaConnectionError):
+            call_with_resilience(
+                "test", func, breaker=breaker, budget=budget, max_retries=5, backoff=0
+            )
+
+        self.assertEqual(func.call_count, 4)
+        self.assertFalse(budget.try_spend())
+
+
+class PaymentTransitionConcurrencyTests(TransactionTestCase):
+    threads = 16
+    rounds = 30
+
+    def test_concurrent_updates_keep_payments_and_counters_consistent(self):
+        payments = [create_payment(f"eT-stress-{i}") for i in range(10)]
+        responses = ["PENDING", "INCOMPLETE", "COMPLETED"]
+        completed = set()
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(self.rounds):
+                    payment = Payment.objects.get(pk=random.choice(payments).pk)
+                    response = random.choice(responses)
+                    payment.record_gateway_response(
+                        {"status": response, "third_party_trans_id": f"T{payment.pk}"},
+                        source="webhook",
+                    )
+                    if response == "COMPLETED":
+                        with lock:
+                            completed.add(payment.pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # Un paiement confirmé au moins une fois reste terminé
+        self.assertEqual(
+            set(
+                Payment.objects.filter(status="completed").values_list("pk", flat=True)
+            ),
+            completed,
+        )
+        actual = dict(
+            Payment.objects.order_by()
+            .values("status")
+            .annotate(count=Count("id"))
+            .values_list("status", "count")
+        )
+        counts = PaymentStatusCounter.get_counts()
+        for status, _ in Payment.STATUS_CHOICES:
+            self.assertEqual(counts[status], actual.get(status, 0), status)
+        self.assertEqual(
+            sum(p.events.count() for p in payments), self.threads * self.rounds
+        )
+
+
+def run_concurrently(func, threads):
+    """Appelle func(i) dans `threads` threads démarrés au même instant"""
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = func(i)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+class RateLimitTests(TransactionTestCase):
+    threads = 20
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_token_bucket_admits_its_capacity_under_concurrent_load(self):
+        bucket = TokenBucket("test", "5/m")
+
+        results = run_concurrently(lambda i: bucket.consume("10.0.0.1"), self.threads)
+
+        self.assertEqual(results.count(0), 5)
+        # Les refus annoncent l'attente avant le prochain jeton (12 s pour 5/m)
+        self.assertTrue(all(0 < r <= 12 for r in results if r))
+        self.assertEqual(bucket.consume("10.0.0.2"), 0)
+
+    def test_payment_creation_is_limited_per_ip(self):
+        def fake_initiate_payment(payment_data):
+            return {"url": "http://gateway.test/pay"}, payment_data
+
+        def submit(i):
+            return Client(REMOTE_ADDR="10.0.0.1").post(
+                reverse("app:payment-form"),
+                {
+                    "lastname": "Ouedraogo",
+                    "firstname": "Awa",
+                    "phone": f"+2267000{i:04d}",
+                    "amount": "1000",
+                },
+            )
+
+        with mock.patch.dict(LIMITS, create=_buckets("create", "3/m", "")), mock.patch(
+            "app.views.initiate_payment", fake_initiate_payment
+        ):
+            responses = run_concurrently(submit, self.threads)
+
+        codes = [response.status_code for response in responses]
+        self.assertEqual((codes.count(302), codes.count(429)), (3, self.threads - 3))
+        self.assertTrue(
+            all(r.has_header("Retry-After") for r in responses if r.status_code == 429)
+        )
+        # Les requêtes refusées n'écrivent rien en base
+        self.assertEqual(Payment.objects.count(), 3)
+
+    def test_payment_verification_is_limited_per_phone(self):
+        payment = create_payment("eT-ratelimit-1")
+
+        def verify(i):
+            # Une IP différente par requête : seule la limite par téléphone joue
+            return Client(REMOTE_ADDR=f"10.0.1.{i}").get(
+                reverse("app:verify-payment"),
+                {"paymentRequestID": payment.reference},
+            )
+
+        with mock.patch.dict(
+            LIMITS, verify=_buckets("verify", "1/m", "4/m")
+        ), mock.patch(
+            "app.views.cached_check_payment", return_value={"status": "PENDING"}
+        ) as check:
+            responses = run_concurrently(verify, self.threads)
+
+        codes = [response.status_code for response in responses]
+        self.assertEqual((codes.count(200), codes.count(429)), (4, self.threads - 4))
+        self.assertEqual(check.call_count, 4)
+        refused = next(r for r in responses if r.status_code == 429)
+        self.assertFalse(refused.json()["success"])
+
+    def test_gateway_calls_are_capped(self):
+        def slow_call(operation, func, *args, **kwargs):
+            time.sleep(0.5)
+            return {"status": "PENDING"}
+
+        def check(i):
+            try:
+                gateway.check_payment(f"eT-cap-{i}")
+                return "ok"
+            except GatewayBusyError:
+                return "busy"
+
+        with mock.patch.object(
+            gateway, "_gateway_slots", threading.BoundedSemaphore(3)
+        ), mock.patch.object(gateway, "call_with_resilience", slow_call):
+            results = run_concurrently(check, 10)
+
+        self.assertEqual((results.count("ok"), results.count("busy")), (3, 7))
+
+
+class GatewayTokenTests(TransactionTestCase):
+    def setUp(self):
+        self.arzeka = gateway.get_client()
+        self.reset_client()
+        self.addCleanup(self.reset_client)
+
+    def reset_client(self):
+        self.arzeka._token = None
+        self.arzeka._expires_at = None
+
+    def authenticate(self, **kwargs):
+        kwargs.setdefault("return_value", {"access_token": "NEW", "expires_in": 3600})
+        return mock.patch("app.gateway.fasoarzeka.authenticate", **kwargs)
+
+    def store_token(self, expires_in, **fields):
+        GatewayToken.objects.create(
+            pk=1,
+            access_token="OLD",
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
+            **fields,
+        )
+
+    def test_first_use_stores_the_token(self):
+        with self.authenticate() as authenticate:
+            gateway.ensure_authenticated()
+            gateway.ensure_authenticated()
+
+        authenticate.assert_called_once()
+        token = GatewayToken.objects.get()
+        self.assertEqual(token.access_token, "NEW")
+        self.assertIsNone(token.refreshing_until)
+        self.assertEqual(self.arzeka._token, "NEW")
+
+    def test_concurrent_callers_authenticate_once(self):
+        def slow_authenticate(*args, **kwargs):
+            time.sleep(0.1)
+            return {"access_token": "NEW", "expires_in": 3600}
+
+        with self.authenticate(side_effect=slow_authenticate) as authenticate:
+            run_concurrently(lambda i: gateway.ensure_authenticated(), 8)
+
+        authenticate.assert_called_once()
+        self.assertEqual(self.arzeka._token, "NEW")
+
+    def test_auth_failure_keeps_a_still_valid_token(self):
+        # Dans la marge de renouvellement, mais encore utilisable
+        self.store_token(200)
+
+        with self.authenticate(
+            side_effect=ArzekaAuthenticationError("refusé")
+        ) as authenticate:
+            gateway.ensure_authenticated()
+            self.reset_client()
+            # La réservation n'est pas levée : pas de nouvel essai immédiat
+            gateway.ensure_authenticated()
+
+        authenticate.assert_called_once()
+        self.assertEqual(self.arzeka._token, "OLD")
+        self.assertEqual(GatewayToken.objects.get().access_token, "OLD")
+
+    def test_token_being_refreshed_elsewhere_is_reused(self):
+        self.store_token(200, refreshing_until=timezone.now() + timedelta(seconds=60))
+
+        with self.authenticate() as authenticate:
+            gateway.ensure_authenticated()
+
+        authenticate.assert_not_called()
+        self.assertEqual(self.arzeka._token, "OLD")
+
+    def test_expired_token_forces_a_refresh(self):
+        self.store_token(-10)
+
+        with self.authenticate() as authenticate:
+            gateway.ensure_authenticated()
+
+        authenticate.assert_called_once()
+        self.assertEqual(self.arzeka._token, "NEW")
+        self.assertEqual(GatewayToken.objects.get().access_token, "NEW")
+
+        # Sans jeton utilisable, l'échec de l'authentification est remonté
+        GatewayToken.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=10), refreshing_until=None
+        )
+        self.reset_client()
+        with self.authenticate(side_effect=ArzekaAuthenticationError("refusé")):
+            with self.assertRaises(ArzekaAuthenticationError):
+                gateway.ensure_authenticated()
@@ -5,12 +5,35 @@ from app import views
 app_name = "app"
 urlpatterns = [
     path("", views.PaymentFormView.as_view(), name="payment-form"),
+    path("async/", views.AsyncPaymentFormView.as_view(), name="payment-form-async"),
     path("payments/", views.PaymentListView.as_view(), name="payment-list"),
+    path("payments/export/", views.export_payments, name="payment-export"),
+    path("payments/dashboard/", views.payment_dashboard, name="payment-dashboard"),
+    path(
+        "payments/dashboard.json",
+        views.payment_dashboard_json,
+        name="payment-dashboard-json",
+    ),
     path(
         "payments/<int:payment_id>/",
         views.PaymentDetailView.as_view(),
         name="payment-detail",
     ),
+    path(
+        "payments/<int:payment_id>/payloads/<str:name>/",
+        views.payment_payload,
+        name="payment-payload",
+    ),
+    path(
+        "payments/<int:payment_id>/events/",
+        views.payment_status_stream,
+        name="payment-events",
+    ),
+    path(
+        "payments/<int:payment_id>/status/",
+        views.payment_status,
+        name="payment-status",
+    ),
     path("verify-payment/", views.verify_payment, name="verify-payment"),
     path(
         "check-payment-status/",
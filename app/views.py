@@ -1,22 +1,82 @@
+import asyncio
+import hmac
 import json
+import logging
+import time
+from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-from django.http import HttpResponseRedirect, JsonResponse
-from django.shortcuts import get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Exists, OuterRef, Subquery
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import CreateView, DetailView, ListView, View
-from fasoarzeka import check_payment, initiate_payment
 from fasoarzeka.exceptions import ArzekaAPIError
 
-from app.forms import PaymentForm
-from app.models import Payment
-from web.utils import convert_arzeka_payment_status, get_reference
+from app.cache import get_fragment
+from app.dashboard import dashboard_data
+from app.exports import CONTENT_TYPES, buffered, export_lines, export_queryset
+from app.forms import PaymentDashboardForm, PaymentExportForm, PaymentForm
+from app.gateway import ainitiate_payment, cached_check_payment, initiate_payment
+from app.metrics import render_metrics
+from app.models import (
+    PAYLOAD_FIELDS,
+    Payment,
+    PaymentEvent,
+    PaymentPayload,
+    PaymentStatusCounter,
+    WebhookJob,
+)
+from app.pagination import KeysetPaginator
+from app.ratelimit import check_limits, client_ip, too_many_requests
+from app.resilience import GatewayBusyError
+from app.streams import status_events, status_row
+from web.utils import get_reference
+
+logger = logging.getLogger(__name__)
 
 FASOARZEKA_HASHSECRET = getattr(settings, "FASOARZEKA_HASHSECRET", None)
 FASOARZEKA_MERCHANTID = getattr(settings, "FASOARZEKA_MERCHANTID", None)
+# Adresse publique du site, utilisée dans les liens de retour donnés à Arzeka
+PAYMENT_CALLBACK_URL = getattr(
+    settings, "PAYMENT_CALLBACK_URL", "http://localhost:8000"
+)
+# Secret ajouté au lien du webhook (?token=...) ; vide pour ne pas l'exiger
+PAYMENT_WEBHOOK_SECRET = getattr(settings, "PAYMENT_WEBHOOK_SECRET", "")
+# Intervalle (secondes) de relecture du statut par la page de détail d'un
+# paiement en cours quand le flux n'est pas disponible (déploiement WSGI)
+PAYMENT_STATUS_REFRESH_INTERVAL = getattr(
+    settings, "PAYMENT_STATUS_REFRESH_INTERVAL", 10
+)
+PAYMENT_STREAM_MAX_DURATION = getattr(settings, "PAYMENT_STREAM_MAX_DURATION", 300)
+# Accès à /metrics : adresses autorisées ou jeton « Authorization: Bearer »
+METRICS_ALLOWED_IPS = getattr(settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+METRICS_TOKEN = getattr(settings, "METRICS_TOKEN", "")
+
+
+def webhook_url():
+    """Lien du webhook transmis à Arzeka, avec le secret partagé s'il existe"""
+    url = PAYMENT_CALLBACK_URL + reverse("app:update-payment-status")
+    if PAYMENT_WEBHOOK_SECRET:
+        url += "?" + urlencode({"token": PAYMENT_WEBHOOK_SECRET})
+    return url
 
 
 class PaymentFormView(CreateView):
@@ -27,6 +87,30 @@ class PaymentFormView(CreateView):
     def get_success_url(self):
         return reverse("app:payment-detail", kwargs={"payment_id": self.payment.id})
 
+    def get_payment_data(self, form):
+        """Construit les données envoyées à la passerelle Arzeka"""
+        return {
+            "amount": self.payment.amount,
+            "merchant_id": FASOARZEKA_MERCHANTID,
+            "hash_secret": FASOARZEKA_HASHSECRET,
+            "mapped_order_id": self.payment.reference,
+            "additional_info": {
+                "firstname": form.cleaned_data.get("firstname"),
+                "lastname": form.cleaned_data.get("lastname"),
+                "mobile": form.cleaned_data.get("phone"),
+            },
+            "link_for_update_status": webhook_url(),
+            "link_back_to_calling_website": PAYMENT_CALLBACK_URL
+            + reverse("app:check-payment-status"),
+        }
+
+    def post(self, request, *args, **kwargs):
+        # Limites par IP et par téléphone, avant toute écriture en base
+        retry_after = check_limits("create", request, request.POST.get("phone"))
+        if retry_after:
+            return too_many_requests(retry_after)
+        return super().post(request, *args, **kwargs)
+
     def form_valid(self, form):
         # Récupérer les données nettoyées
         try:
@@ -34,31 +118,25 @@ class PaymentFormView(CreateView):
             form.instance.reference = reference
             self.payment: Payment = form.save()
 
-            payment_data = {
-                "amount": self.payment.amount,
-                "merchant_id": FASOARZEKA_MERCHANTID,
-                "hash_secret": FASOARZEKA_HASHSECRET,
-                "mapped_order_id": reference,
-                "additional_info": {
-                    "firstname": form.cleaned_data.get("firstname"),
-                    "lastname": form.cleaned_data.get("lastname"),
-                    "mobile": form.cleaned_data.get("phone"),
-                },
-                "link_for_update_status": "http://localhost:8000"
-                + reverse("app:update-payment-status"),
-                "link_back_to_calling_website": "http://localhost:8000"
-                + reverse("app:check-payment-status"),
-            }
+            payment_data = self.get_payment_data(form)
 
             response, processed_data = initiate_payment(payment_data)
-            self.payment.request_data = processed_data
-            self.payment.intermediary_response = response
-            self.payment.save()
+            self.payment.store_payloads(
+                request_data=processed_data, intermediary_response=response
+            )
+            PaymentEvent.objects.create(
+                payment=self.payment,
+                source="initiate",
+                status=self.payment.status,
+                payload=response,
+            )
         except ArzekaAPIError as e:
             error_msg = "\n".join(e.response_data.values())
             messages.error(self.request, error_msg)
 
             return self.form_invalid(form)
+        except GatewayBusyError as e:
+            return self.gateway_busy(form, e)
         except Exception as e:
             error_msg = str(e)
             messages.error(self.request, error_msg)
@@ -82,6 +160,81 @@ class PaymentFormView(CreateView):
         )
         return self.render_to_response(self.get_context_data(form=form))
 
+    def gateway_busy(self, form, error):
+        """Formulaire renvoyé en 429 quand les appels à la passerelle sont saturés"""
+        messages.error(self.request, str(error))
+        response = self.form_invalid(form)
+        response.status_code = 429
+        response["Retry-After"] = "1"
+        return response
+
+
+class AsyncPaymentFormView(PaymentFormView):
+    """
+    Version asynchrone de PaymentFormView, à servir via web/asgi.py
+
+    L'appel à la passerelle ne bloque pas la boucle d'événements : il est
+    plafonné et limité dans le temps par `app.gateway.ainitiate_payment`.
+    """
+
+    http_method_names = ["get", "post"]
+
+    async def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        retry_after = await sync_to_async(check_limits)(
+            "create", request, request.POST.get("phone")
+        )
+        if retry_after:
+            return too_many_requests(retry_after)
+        self.object = None
+        form = self.get_form()
+        if await sync_to_async(form.is_valid)():
+            return await self.aform_valid(form)
+        return self.form_invalid(form)
+
+    async def aform_valid(self, form):
+        try:
+            form.instance.reference = get_reference()
+            self.payment: Payment = await sync_to_async(form.save)()
+
+            payment_data = self.get_payment_data(form)
+
+            response, processed_data = await ainitiate_payment(payment_data)
+            await sync_to_async(self.payment.store_payloads)(
+                request_data=processed_data, intermediary_response=response
+            )
+            await PaymentEvent.objects.acreate(
+                payment=self.payment,
+                source="initiate",
+                status=self.payment.status,
+                payload=response,
+            )
+        except ArzekaAPIError as e:
+            error_msg = "\n".join(e.response_data.values())
+            messages.error(self.request, error_msg)
+            return self.form_invalid(form)
+        except GatewayBusyError as e:
+            return self.gateway_busy(form, e)
+        except asyncio.TimeoutError:
+            messages.error(
+                self.request,
+                "La plateforme de paiement ne répond pas, veuillez réessayer.",
+            )
+            return self.form_invalid(form)
+        except Exception as e:
+            messages.error(self.request, str(e))
+            return self.form_invalid(form)
+
+        messages.info(
+            self.request,
+            f"Vous serez redirigé vers la plateforme de paiement: {response.get('url','')} ",
+        )
+        messages.success(self.request, "Paiement enregistré avec succès !")
+
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class PaymentListView(ListView):
     """Vue pour lister tous les paiements"""
@@ -91,14 +244,27 @@ class PaymentListView(ListView):
     context_object_name = "payments"
     paginate_by = 10
     ordering = ["-created_at"]
+    # Afficher le nombre total de pages (lu dans les compteurs de statut)
+    count_pages = True
+
+    def paginate_queryset(self, queryset, page_size):
+        """Pagination par curseur (created_at, id) au lieu de OFFSET"""
+        count = self.get_counts()["total"] if self.count_pages else None
+        paginator = KeysetPaginator(queryset, page_size, count=count)
+        page = paginator.page(self.request.GET.get("cursor"))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_counts(self):
+        if not hasattr(self, "_counts"):
+            self._counts = PaymentStatusCounter.get_counts()
+        return self._counts
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["total_payments"] = Payment.objects.count()
-        context["pending_payments"] = Payment.objects.filter(status="pending").count()
-        context["completed_payments"] = Payment.objects.filter(
-            status="completed"
-        ).count()
+        counts = self.get_counts()
+        context["total_payments"] = counts["total"]
+        context["pending_payments"] = counts["pending"]
+        context["completed_payments"] = counts["completed"]
         return context
 
 
@@ -106,12 +272,19 @@ class PaymentListView(ListView):
 def verify_payment(request):
     """Vue AJAX pour vérifier le statut d'un paiement"""
     try:
+        retry_after = check_limits("verify", request)
+        if retry_after:
+            return too_many_requests(retry_after, json=True)
+
         reference = request.GET.get("paymentRequestID")
         payment = get_object_or_404(Payment, reference=reference)
+        retry_after = check_limits("verify", phone=payment.phone)
+        if retry_after:
+            return too_many_requests(retry_after, json=True)
 
-        payment = check_payment(payment.reference)
+        payment = cached_check_payment(payment.reference)
 
-        print(payment)
+        logger.debug("Vérification de %s : %s", reference, payment)
 
         # Simuler une vérification avec l'API Fasoarzeka
         # En production, vous feriez un appel API réel
@@ -124,8 +297,11 @@ def verify_payment(request):
             }
         )
 
+    except GatewayBusyError as e:
+        return too_many_requests(1, str(e), json=True)
+
     except ArzekaAPIError as e:
-        print(e.response_data)
+        logger.warning("Erreur Arzeka pour %s : %s", reference, e.response_data)
         return JsonResponse(
             {
                 "success": False,
@@ -145,35 +321,14 @@ class CheckPaymentStatusView(View):
         try:
             reference = request.GET.get("paymentRequestID")
             payment = Payment.objects.get(reference=reference)
-            payment_data = check_payment(payment.reference)
-            payment_status = convert_arzeka_payment_status(
-                payment_data.get("status", "pending")
+            payment_data, called = cached_check_payment(
+                payment.reference, with_origin=True
+            )
+            # Une réponse reprise du cache ou d'un appel concurrent n'est
+            # journalisée que si elle change le statut
+            payment.record_gateway_response(
+                payment_data, source="check", only_changes=not called
             )
-
-            print("payment_data:", payment_data, "payment_status:", payment_status)
-
-            # Génération de timbre
-
-            if payment_status == "completed":
-                payment.final_response = payment_data
-                payment.transaction_id = payment_data.get("third_party_trans_id")
-                payment.status = payment_status
-                payment.save()
-            else:
-                intermediary_response = payment.intermediary_response
-
-                if isinstance(intermediary_response, dict):
-                    payment.intermediary_response = [
-                        intermediary_response,
-                        payment_data,
-                    ]
-
-                elif isinstance(intermediary_response, list):
-                    intermediary_response.append(payment_data)
-                    payment.intermediary_response = intermediary_response
-
-                payment.status = payment_status
-                payment.save()
 
             messages.info(
                 request,
@@ -194,51 +349,45 @@ class CheckPaymentStatusView(View):
         )
 
 
+@method_decorator(csrf_exempt, name="dispatch")
 class UpdatePaymentStatusView(View):
     http_method_names = ["post"]
-    """Vue pour mettre à jour le statut d'un paiement via une requête POST"""
+    """
+    Webhook appelé par Arzeka lors d'un changement de statut
+
+    La notification est seulement validée puis mise en file (WebhookJob) ;
+    la commande process_webhooks se charge de l'appliquer aux paiements.
+    Son contenu n'étant pas signé, elle ne sert que de déclencheur : le
+    statut appliqué est celui que renvoie la passerelle à la vérification.
+    Si PAYMENT_WEBHOOK_SECRET est défini, les appels sans ce secret sont
+    refusés avant la mise en file.
+    """
 
     def post(self, request, *args, **kwargs):
-        try:
-            payment_data = request.POST.data
-            payment = Payment.objects.get(
-                reference=payment_data.get("third_party_mapped_order_id")
+        if PAYMENT_WEBHOOK_SECRET and not hmac.compare_digest(
+            request.GET.get("token", ""), PAYMENT_WEBHOOK_SECRET
+        ):
+            return JsonResponse(
+                {"success": False, "message": "Notification non autorisée."},
+                status=403,
             )
-            payment_status = convert_arzeka_payment_status(
-                payment_data.get("status", "pending")
-            )
-
-            # Génération de timbre
-
-            if payment_status == "completed":
-                payment.final_response = payment_data
-                payment.transaction_id = payment_data.get("third_party_trans_id")
-                payment.status = payment_status
-                payment.save()
-            else:
-                intermediary_response = payment.intermediary_response
-
-                if isinstance(intermediary_response, dict):
-                    payment.intermediary_response = [
-                        intermediary_response,
-                        payment_data,
-                    ]
-
-                elif isinstance(intermediary_response, list):
-                    intermediary_response.append(payment_data)
-                    payment.intermediary_response = intermediary_response
-
-                payment.status = payment_status
-                payment.save()
+        if request.content_type == "application/json":
+            try:
+                payment_data = json.loads(request.body)
+            except ValueError:
+                payment_data = None
+        else:
+            payment_data = request.POST.dict()
 
-            messages.info(
-                request,
-                f"Le statut du paiement a été mis à jour: {payment.status}",
+        if not isinstance(payment_data, dict) or not payment_data.get(
+            "third_party_mapped_order_id"
+        ):
+            return JsonResponse(
+                {"success": False, "message": "Notification invalide."}, status=400
             )
-        except Exception as e:
-            pass
 
-        return HttpResponseRedirect("/")
+        WebhookJob.enqueue(payment_data)
+        return JsonResponse({"success": True})
 
 
 class PaymentDetailView(DetailView):
@@ -248,10 +397,24 @@ class PaymentDetailView(DetailView):
     template_name = "payment_detail.html"
     context_object_name = "payment"
     pk_url_kwarg = "payment_id"
+    # Nombre maximal d'événements affichés dans l'historique
+    history_size = 20
+
+    def get_queryset(self):
+        # Les réponses JSON ne sont pas chargées ici : seule leur présence est
+        # testée, le contenu est servi à la demande par payment_payload
+        return Payment.objects.annotate(
+            has_payload=Exists(PaymentPayload.objects.filter(payment=OuterRef("pk"))),
+            last_event_id=Subquery(
+                PaymentEvent.objects.filter(payment=OuterRef("pk"))
+                .order_by("-created_at", "-id")
+                .values("id")[:1]
+            ),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        payment = self.get_object()
+        payment = self.object
 
         # Calculer la durée depuis la création
         import datetime
@@ -279,8 +442,28 @@ class PaymentDetailView(DetailView):
         # Déterminer les actions possibles selon le statut
         context["can_verify"] = payment.status in ["pending", "processing"]
         context["can_cancel"] = payment.status in ["pending", "processing"]
+        # Flux des statuts sous ASGI, relecture légère du statut sous WSGI
+        context["status_stream"] = isinstance(self.request, ASGIRequest)
+        context["refresh_interval"] = int(PAYMENT_STATUS_REFRESH_INTERVAL * 1000)
+
+        # Détails, chronologie et données techniques ne changent qu'avec le
+        # paiement, ses événements ou ses réponses stockées : rendus une fois
+        # par version
+        context["details_html"] = get_fragment(
+            "payment-detail",
+            payment.pk,
+            (payment.updated_at, payment.last_event_id, payment.has_payload),
+            lambda: render_to_string(
+                "payment_detail_fragment.html",
+                {"payment": payment, "status_history": self.get_status_history()},
+            ),
+        )
 
-        # Historique des statuts (simulé - en production, utilisez un modèle StatusHistory)
+        return context
+
+    def get_status_history(self):
+        """Historique des statuts : création puis derniers événements passerelle"""
+        payment = self.object
         status_history = [
             {
                 "status": "pending",
@@ -289,17 +472,170 @@ class PaymentDetailView(DetailView):
                 "description": "Paiement créé et en attente de traitement",
             }
         ]
-
-        if payment.status != "pending":
+        events = payment.events.only("source", "status", "created_at").order_by(
+            "-created_at", "-id"
+        )[: self.history_size]
+        for event in reversed(list(events)):
             status_history.append(
                 {
-                    "status": payment.status,
-                    "label": payment.get_status_display(),
-                    "timestamp": payment.updated_at,
-                    "description": f"Statut mis à jour: {payment.get_status_display()}",
+                    "status": event.status,
+                    "label": event.get_status_display(),
+                    "timestamp": event.created_at,
+                    "description": f"{event.get_source_display()}: "
+                    f"{event.get_status_display()}",
                 }
             )
+        return status_history
 
-        context["status_history"] = status_history
 
-        return context
+@require_GET
+def payment_payload(request, payment_id, name):
+    """Renvoie une réponse de la passerelle en JSON indenté, en flux"""
+    if name not in PAYLOAD_FIELDS:
+        raise Http404("Donnée inconnue")
+    value = (
+        PaymentPayload.objects.filter(payment_id=payment_id)
+        .values_list(name, flat=True)
+        .first()
+    )
+    chunks = json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(value)
+    return StreamingHttpResponse(
+        buffered(chunks, size=8192), content_type="application/json; charset=utf-8"
+    )
+
+
+async def payment_status_stream(request, payment_id):
+    """
+    Flux server-sent events des changements de statut d'un paiement
+
+    Une connexion par page de détail ouverte remplace les vérifications
+    répétées : le statut enregistré par le webhook ou la réconciliation
+    (d'autres processus) est relu pour tous les flux du worker par un seul
+    diffuseur (app.streams.StatusNotifier), sans appel à la passerelle.
+    Le flux se ferme sur un statut définitif ou après
+    PAYMENT_STREAM_MAX_DURATION secondes (EventSource se reconnecte alors).
+
+    Servi uniquement via web/asgi.py : sous WSGI, chaque flux occuperait un
+    worker. La réponse 204 indique alors à EventSource de ne pas se
+    reconnecter, et la page de détail interroge payment_status.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    payment = (
+        await Payment.objects.filter(pk=payment_id)
+        .values("id", "status", "updated_at")
+        .afirst()
+    )
+    if payment is None:
+        raise Http404("Paiement introuvable")
+
+    response = StreamingHttpResponse(
+        status_events(
+            payment,
+            request.headers.get("Last-Event-ID"),
+            PAYMENT_STREAM_MAX_DURATION,
+        ),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_GET
+def payment_status(request, payment_id):
+    """
+    Statut enregistré d'un paiement, relu périodiquement par la page de
+    détail sous WSGI : une requête par clé primaire, sans appel à la
+    passerelle, la page n'étant rechargée que si le statut a changé.
+    """
+    payment = (
+        Payment.objects.filter(pk=payment_id)
+        .values("id", "status", "updated_at")
+        .first()
+    )
+    if payment is None:
+        raise Http404("Paiement introuvable")
+    response = JsonResponse(status_row(payment))
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@staff_member_required
+@require_GET
+def export_payments(request):
+    """
+    Export des paiements en CSV ou JSONL, diffusé en flux
+
+    Paramètres : format (csv, jsonl), status, since et until (AAAA-MM-JJ).
+    """
+    form = PaymentExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"success": False, "errors": form.errors}, status=400)
+
+    export_format = form.cleaned_data["format"] or "csv"
+    queryset = export_queryset(
+        form.cleaned_data["status"],
+        form.cleaned_data["since"],
+        form.cleaned_data["until"],
+    )
+    response = StreamingHttpResponse(
+        buffered(export_lines(queryset, export_format)),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    filename = f"paiements-{timezone.localdate():%Y%m%d}.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+@require_GET
+def payment_dashboard(request):
+    """
+    Tableau de bord : nombre et montant des paiements par période et statut
+
+    Paramètres : granularity (hour, day), since et until (AAAA-MM-JJ).
+    """
+    form = PaymentDashboardForm(request.GET)
+    context = {"form": form, "statuses": Payment.STATUS_CHOICES}
+    if form.is_valid():
+        context.update(dashboard_data(**form.cleaned_data))
+        context["status_totals"] = [
+            (label, context["totals"][status])
+            for status, label in Payment.STATUS_CHOICES
+        ]
+    return render(
+        request,
+        "payment_dashboard.html",
+        context,
+        status=200 if form.is_valid() else 400,
+    )
+
+
+@staff_member_required
+@require_GET
+def payment_dashboard_json(request):
+    """Données du tableau de bord en JSON (mêmes paramètres)"""
+    form = PaymentDashboardForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"success": False, "errors": form.errors}, status=400)
+    return JsonResponse({"success": True, **dashboard_data(**form.cleaned_data)})
+
+
+@require_GET
+def metrics(request):
+    """
+    Mesures de l'application au format texte Prometheus
+
+    Réservées aux adresses de METRICS_ALLOWED_IPS ou aux requêtes présentant
+    le jeton METRICS_TOKEN.
+    """
+    authorization = request.headers.get("Authorization", "")
+    if client_ip(request) not in METRICS_ALLOWED_IPS and not (
+        METRICS_TOKEN and hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}")
+    ):
+        return HttpResponseForbidden()
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
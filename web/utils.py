@@ -1,18 +1,109 @@
-from datetime import datetime
+import os
+import random
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+
+class ReferenceGenerator:
+    """
+    Unique, roughly time-sortable reference IDs across processes and hosts,
+    without any database round-trip
+
+    Format: eT{YYMMDD}.{HHMMSS}.{mmm}{node}{sequence}
+    Example: eT251022.143025.1234f3a9c210001
+
+    - the UTC timestamp (millisecond precision) keeps references sortable;
+    - node (8 hex chars) identifies the process. With REFERENCE_NODE_ID (a
+      host number from 0 to 255, unique per host), it is that number followed
+      by the pid on 24 bits, which covers Linux's largest pid_max: processes
+      running on the same host never share a node. Otherwise it is derived
+      from the hostname, the pid and a random salt;
+    - sequence (4 hex chars) tells apart references generated within the same
+      millisecond; when exhausted, the generator waits for the next one.
+
+    The node is recomputed after a fork (e.g. gunicorn --preload workers).
+    """
+
+    MAX_SEQUENCE = 0xFFFF
+    MAX_HOST_ID = 0xFF
+
+    def __init__(self, node_id=None):
+        self._lock = threading.Lock()
+        self._node_id = node_id
+        self._pid = None
+        # The lock may be held by another thread at fork time: the child
+        # starts with a fresh one and recomputes its node
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _reset(self):
+        self._pid = os.getpid()
+        node_id = self._node_id
+        if node_id is None:
+            node_id = os.environ.get("REFERENCE_NODE_ID")
+        if node_id is None:
+            seed = (
+                f"{socket.gethostname()}:{self._pid}:{random.SystemRandom().random()}"
+            )
+            node = zlib.crc32(seed.encode())
+        else:
+            host_id = int(node_id)
+            if not 0 <= host_id <= self.MAX_HOST_ID:
+                raise ValueError(
+                    f"REFERENCE_NODE_ID must be between 0 and {self.MAX_HOST_ID}"
+                )
+            node = (host_id << 24) | (self._pid & 0xFFFFFF)
+        self._node = f"{node:08x}"
+        self._last_ms = 0
+        self._sequence = 0
+        self._prefix = ""
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+
+            # Never go back in time, even if the system clock does
+            now_ms = max(time.time_ns() // 1_000_000, self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence += 1
+                if self._sequence > self.MAX_SEQUENCE:
+                    while now_ms <= self._last_ms:
+                        now_ms = time.time_ns() // 1_000_000
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+
+            if now_ms != self._last_ms:
+                moment = datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc)
+                self._prefix = (
+                    f"eT{moment:%y%m%d.%H%M%S}.{now_ms % 1000:03d}{self._node}"
+                )
+                self._last_ms = now_ms
+
+            return f"{self._prefix}{self._sequence:04x}"
+
+
+_reference_generator = ReferenceGenerator()
 
 
 def get_reference() -> str:
     """
     Generate a unique reference ID for payment transactions
 
-    Format: eT{YYMMDD}.{HHMMSS}.{microseconds}
-    Example: eT251022.143025.123456
+    Format: eT{YYMMDD}.{HHMMSS}.{milliseconds}{node}{sequence}
+    Example: eT251022.143025.1234f3a9c210001
 
     Returns:
-        str: Unique reference ID
+        str: Unique reference ID, see ReferenceGenerator
     """
-    reference = datetime.now().strftime("%y%m%d.%H%M%S.%f")
-    return f"eT{reference}"
+    return _reference_generator()
 
 
 def convert_arzeka_payment_status(status):